@@ -1,13 +1,28 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
+import datetime
 import io
-import base64
-from PIL import Image
+import multiprocessing
 import os
-import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from bni_analytics import chapter_summary
+from bni_cache import ParsedDataCache
+from bni_charts import (FigureCache, bar_chart_spec, chart_key, line_chart_spec, long_format,
+                        metric_group_data, open_figure_count, render_bar_chart, render_line_chart,
+                        without_categories)
+from bni_export import EXPORT_FORMATS, export_bytes, export_filename
+from bni_history import HistoryStore, content_hash
+from bni_imports import import_times, prewarm
+from bni_loader import load_report, merge_reports, read_chunked, report_period
+from bni_members import MemberIndex
+from bni_perf import PerfRecorder, current_rss_mb
+from bni_schema import SCHEMAS
+from bni_scoring import LIGHT_COLUMN, SCORE_COLUMN, MemberScores, load_profiles
+from bni_sort import SortIndex
 
 # Seitenkonfiguration
 st.set_page_config(
@@ -17,131 +32,592 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Diagramm-Backends: Bilder vom Server oder interaktiv im Browser
+CHART_BACKENDS = {"matplotlib": "Bilder (matplotlib)", "vega": "Interaktiv (Vega-Lite)"}
+DEFAULT_CHART_BACKEND = os.environ.get("BNI_CHART_BACKEND", "matplotlib")
+
+# Performance-Messung ist standardmäßig aus; BNI_PERF=1 schaltet sie vorab ein
+DEFAULT_PERF = os.environ.get("BNI_PERF", "") == "1"
+
+# Diagramm- und Excel-Bibliotheken werden nach dem ersten Bericht im Hintergrund
+# vorgeladen; BNI_PREWARM=0 lädt sie erst beim ersten Diagramm bzw. Excel-Export
+PREWARM = os.environ.get("BNI_PREWARM", "1") != "0"
+
 # Titel und Einführung
 st.title("BNI Chapter Gulda - Dashboard")
 st.markdown("### Vergleichen Sie Mitglieder und analysieren Sie Kennzahlen")
 
-# Funktion zum Erkennen des Dateiformats
-def detect_file_format(df):
-    """Erkennt das Format der Datei basierend auf den Spalten."""
-    columns = set(df.columns)
+# Funktion zum Laden der Daten
+@st.cache_resource
+def get_data_cache():
+    """Gemeinsamer Festplatten-Cache für eingelesene Berichte (einer pro Prozess)."""
+    return ParsedDataCache()
+
+@st.cache_resource
+def get_process_pool():
+    """Prozess-Pool zum parallelen Einlesen mehrerer Berichte (einer pro Prozess)."""
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+
+@st.cache_resource(max_entries=3)
+def load_data(_uploaded_files, data_token):
+    """Liest die hochgeladenen Berichte einmal je Datensatz; ``data_token`` (file_ids und
+    Einlesemodus) ersetzt das Hashen der Dateiinhalte, der DataFrame wird nicht kopiert."""
+    uploaded_files = _uploaded_files
+    chunked = data_token[1]
+    sniffs = []
+    try:
+        # Große Exporte werden stückweise gelesen und je Mitglied zusammengefasst
+        loader = read_chunked if chunked else load_report
+        
+        # Bereits eingelesene Dateien werden anhand ihres Inhalts im
+        # Festplatten-Cache gefunden und müssen nicht erneut geparst werden;
+        # mehrere neue Dateien werden parallel in eigenen Prozessen gelesen
+        files = [(f.name, f.getvalue()) for f in uploaded_files]
+        results = get_data_cache().load_many(
+            files, loader,
+            variant="chunked" if chunked else "",
+            executor=get_process_pool() if len(files) > 1 else None
+        )
+        sniffs = [(name, sniff) for (name, _), (_, _, sniff, _) in zip(files, results)]
+        
+        for (name, _), (_, _, sniff, cache_hit) in zip(files, results):
+            if cache_hit:
+                st.success(f"{name} aus dem Cache geladen")
+            else:
+                st.success(f"{name} erfolgreich als {sniff.describe()} gelesen")
+        
+        file_formats = {file_format for _, file_format, _, _ in results}
+        if len(file_formats) > 1:
+            return None, None, f"Die Dateien haben unterschiedliche Formate ({', '.join(sorted(file_formats))}).", sniffs
+        file_format = file_formats.pop()
+        
+        if len(results) == 1:
+            df = results[0][0]
+        else:
+            df = merge_reports([(name, result[0]) for (name, _), result in zip(files, results)])
+        
+        return df, file_format, None, sniffs
     
-    # Format 1: Pagisto-Format (neues Format)
-    pagisto_columns = {"Datum", "Mitglied", "Platzierung", "Abwesenheit", "Empfehlungen", 
-                       "Umsatzdanke", "Besucher", "121s", "Testimonials", "CTE", "Punkte"}
+    except Exception as e:
+        return None, None, f"Fehler beim Laden der Datei: {str(e)}", sniffs
+
+# Messungen der Sitzung, nur wenn die Performance-Messung eingeschaltet ist
+def perf_recorder():
+    if not st.session_state.get('perf_enabled', DEFAULT_PERF):
+        return None
+    if 'perf_recorder' not in st.session_state:
+        st.session_state['perf_recorder'] = PerfRecorder()
+    return st.session_state['perf_recorder']
+
+def perf_stage(category, name, **extra):
+    recorder = perf_recorder()
+    return recorder.stage(category, name, **extra) if recorder is not None else nullcontext()
+
+@st.cache_resource
+def get_figure_cache():
+    """Gemeinsamer Cache für gerenderte Diagramme (einer pro Prozess)."""
+    return FigureCache(max_mb=int(os.environ.get("BNI_FIGURE_CACHE_MB", "64")))
+
+# Funktion zum Anzeigen eines Balkendiagramms; als Bild aus dem Diagramm-Cache oder interaktiv
+def show_bar_chart(data, x, y, hue=None, figsize=(10, 6), ylabel=None):
+    if st.session_state.get('chart_backend', DEFAULT_CHART_BACKEND) == "vega":
+        columns = [x, y] + ([hue] if hue is not None else [])
+        # Ohne die Kategorien des ganzen Berichts, sonst reist das ganze Mitgliederverzeichnis mit
+        st.vega_lite_chart(
+            without_categories(data[columns], (x, hue)),
+            bar_chart_spec(x, y, hue=hue, ylabel=ylabel, height=int(figsize[1] * 60)),
+            use_container_width=True
+        )
+        return
+    def render():
+        with perf_stage("diagramm", "Balken (matplotlib)", rows=len(data)):
+            return render_bar_chart(data, x, y, hue=hue, figsize=figsize, ylabel=ylabel)
     
-    # Format 2: PALMS-Format (altes Format)
-    palms_columns = {"Vorname", "Nachname", "P", "A", "L", "M", "S", 
-                     "G (Eigenbedarf)", "G (extern)", "R (Eigenbedarf)", "R (extern)",
-                     "V", "1-2-1", "U", "CTE", "T"}
+    key = chart_key("bar", data, x=x, y=y, hue=hue, figsize=figsize, ylabel=ylabel)
+    png = get_figure_cache().get_or_render(key, render)
+    st.image(png, use_container_width=True)
+
+# Funktion zum Anzeigen einer Tabelle; kategorische Spalten nur mit den gezeigten Kategorien,
+# sonst überträgt Arrow für jede Seite das ganze Mitgliederverzeichnis
+def show_table(data, **kwargs):
+    categorical = [col for col in data.columns if isinstance(data[col].dtype, pd.CategoricalDtype)]
+    if categorical:
+        data = data.assign(**{col: data[col].cat.remove_unused_categories() for col in categorical})
+    st.dataframe(data, **kwargs)
+
+# Funktion zum Anzeigen einer Kennzahlgruppe als Diagramm mit Tabelle
+def show_metric_group(df_display, schema, group, var_name, figsize=(10, 6), ylabel=None):
+    # Mehrere Kennzahlen im Langformat, mit lesbaren Namen als Legende
+    with perf_stage("aufbereitung", "Langformat (melt)", rows=len(df_display)):
+        chart = metric_group_data(df_display, group, var_name)
+    if chart is None:
+        st.warning("Die Kennzahlen für diese Ansicht fehlen in der Datei.")
+        return
     
-    # Überprüfe, welches Format am besten passt
-    pagisto_match = len(columns.intersection(pagisto_columns)) / len(pagisto_columns)
-    palms_match = len(columns.intersection(palms_columns)) / len(palms_columns)
+    group_data, y, hue = chart
+    show_bar_chart(group_data, x='Mitglied', y=y, hue=hue, figsize=figsize, ylabel=ylabel)
     
-    if pagisto_match > palms_match:
-        return "pagisto"
-    else:
-        return "palms"
+    # Zeige Tabelle
+    show_table(df_display[schema.name_columns + [col for col in group.table if col in df_display.columns]])
 
-# Funktion zum Laden der Daten
-@st.cache_data
-def load_data(uploaded_file):
+# Funktion zum Anzeigen eines Verlaufsdiagramms; als Bild aus dem Diagramm-Cache oder interaktiv
+def show_line_chart(data, x, figsize=(12, 6), ylabel=None):
+    if st.session_state.get('chart_backend', DEFAULT_CHART_BACKEND) == "vega":
+        series = [col for col in data.columns if col != x]
+        st.vega_lite_chart(
+            data, line_chart_spec(x, series, ylabel=ylabel, height=int(figsize[1] * 60)),
+            use_container_width=True
+        )
+        return
+    def render():
+        with perf_stage("diagramm", "Verlauf (matplotlib)", rows=len(data)):
+            return render_line_chart(data, x, figsize=figsize, ylabel=ylabel)
+    
+    key = chart_key("line", data, x=x, figsize=figsize, ylabel=ylabel)
+    png = get_figure_cache().get_or_render(key, render)
+    st.image(png, use_container_width=True)
+
+@st.cache_resource
+def get_history_store():
+    """Verlauf aller gespeicherten Berichte (SQLite, einer pro Prozess)."""
+    return HistoryStore()
+
+@st.cache_resource(max_entries=3)
+def get_sort_index(_df, data_token, file_format):
+    """Sortierreihenfolgen aller Kennzahlen, einmal je Datensatz berechnet und nicht kopiert."""
+    return SortIndex(_df, SCHEMAS[file_format].metrics.values())
+
+@st.cache_resource(max_entries=3)
+def get_member_index(_df, data_token):
+    """Mitglieder-Index mit IDs und Suchschlüsseln, einmal je Datensatz aufgebaut."""
+    return MemberIndex(_df)
+
+@st.cache_resource(max_entries=3)
+def get_chapter_summary(_df, data_token, file_format):
+    """Chapter-Kennzahlen, einmal je Datensatz berechnet."""
+    return chapter_summary(_df, file_format)
+
+@st.cache_resource
+def get_score_profiles():
+    """Gewichtungsprofile der Ampelbewertung, inklusive eigener Profile aus BNI_SCORE_PROFILES."""
+    return load_profiles()
+
+@st.cache_resource(max_entries=6)
+def get_member_scores(_df, data_token, file_format, profile):
+    """Ampelbewertung mit Rangfolge, einmal je Datensatz und Gewichtungsprofil berechnet."""
+    return MemberScores(_df, file_format, get_score_profiles()[profile])
+
+# Zahl im deutschen Format, z.B. 1.234,5
+def format_number(value, decimals=0, suffix=""):
+    if value is None or pd.isna(value):
+        return "–"
+    text = f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{text}{suffix}"
+
+@st.cache_data(max_entries=3, show_spinner="Export wird erstellt...")
+def build_export(_df, data_token, fmt):
+    """Erzeugt die Exportdatei einmal je Datensatz und Format; ``data_token`` ersetzt das Hashen von ``_df``."""
+    return export_bytes(_df, fmt)
+
+# Funktion zum Anzeigen des Exports; die Datei wird erst auf Anforderung erzeugt
+def show_export(df, key):
+    data_token = st.session_state.get('data_token')
+    fmt = st.selectbox("Exportformat", list(EXPORT_FORMATS), key=f"{key}_export_format")
+    if st.button("Export erstellen", key=f"{key}_export_build"):
+        st.session_state[f"{key}_export_requested"] = (data_token, fmt)
+    
+    if st.session_state.get(f"{key}_export_requested") == (data_token, fmt):
+        st.download_button(
+            f"Download als {fmt}",
+            data=build_export(df, data_token, fmt),
+            file_name=export_filename(fmt),
+            mime=EXPORT_FORMATS[fmt][1],
+            key=f"{key}_export_download",
+            on_click="ignore"
+        )
+
+# Laufzeit eines Dashboard-Abschnitts messen und anzeigen
+@contextmanager
+def timed_section(name):
+    start = time.perf_counter()
     try:
-        # Speichere die hochgeladene Datei temporär
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings = st.session_state.setdefault('section_timings', {})
+        runs = timings.get(name, {}).get('runs', 0) + 1
+        timings[name] = {'ms': elapsed, 'runs': runs}
+        recorder = perf_recorder()
+        if recorder is not None:
+            recorder.record("abschnitt", name, elapsed)
+        st.caption(f"{name}: {elapsed:.0f} ms (Ausführung {runs})")
+
+@st.fragment
+def render_chapter_summary(summary):
+    """Tab Chapter-Übersicht mit den vorberechneten Kennzahlen des ganzen Chapters."""
+    with timed_section("Chapter-Übersicht"):
+        st.header("Chapter-Übersicht")
         
-        # Versuche verschiedene Methoden zum Lesen der Datei
-        df = None
-        error_messages = []
+        # Kennzahlen des Chapters; Quoten in Prozent, Beträge in Euro
+        kpi_formats = {
+            'Mitglieder': (0, ""),
+            'Anwesenheitsquote': (1, " %"),
+            'Abwesenheitsquote': (1, " %"),
+            'Empfehlungen gegeben': (0, ""),
+            'Empfehlungen erhalten': (0, ""),
+            'Empfehlungsverhältnis': (2, ""),
+            'Empfehlungen je Mitglied': (1, ""),
+            'Umsatz gesamt': (0, " €"),
+            'Umsatz je Mitglied': (0, " €"),
+        }
+        kpis = [(name, value) for name, value in summary.kpis.items() if name in kpi_formats]
+        for start in range(0, len(kpis), 4):
+            for column, (name, value) in zip(st.columns(4), kpis[start:start + 4]):
+                decimals, suffix = kpi_formats[name]
+                shown = value * 100 if suffix == " %" else value
+                column.metric(name, format_number(shown, decimals, suffix))
         
-        # 1. Wenn es eine Excel-Datei ist, versuche verschiedene Engines
-        if uploaded_file.name.lower().endswith(('.xls', '.xlsx')):
-            engines = ['openpyxl', 'xlrd']
-            for engine in engines:
-                try:
-                    df = pd.read_excel(tmp_file_path, engine=engine)
-                    st.success(f"Datei erfolgreich als Excel mit {engine} gelesen")
-                    break
-                except Exception as e:
-                    error_messages.append(f"Fehler beim Lesen mit {engine}: {str(e)}")
+        st.caption("Anwesenheitsquote: (P + L) / (P + A + L + M + S). "
+                   "Empfehlungsverhältnis: gegebene / erhaltene Empfehlungen.")
         
-        # 2. Wenn es keine Excel-Datei ist oder Excel-Lesen fehlgeschlagen ist, versuche CSV
-        if df is None:
-            # Versuche verschiedene Encodings und Trennzeichen
-            encodings = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'windows-1252']
-            separators = [',', ';', '\t']
-            
-            for encoding in encodings:
-                for sep in separators:
-                    try:
-                        df = pd.read_csv(tmp_file_path, encoding=encoding, sep=sep)
-                        st.success(f"Datei erfolgreich als CSV mit Encoding {encoding} und Trennzeichen '{sep}' gelesen")
-                        break
-                    except Exception as e:
-                        error_messages.append(f"Fehler beim Lesen als CSV mit {encoding} und '{sep}': {str(e)}")
-                if df is not None:
-                    break
+        # Verteilung je Kennzahl
+        st.subheader("Verteilung je Kennzahl")
+        st.dataframe(summary.metrics.round(2))
         
-        # Lösche die temporäre Datei
-        try:
-            os.unlink(tmp_file_path)
-        except:
-            pass
+        # Quoten je Mitglied, sofern das Format sie hergibt; nur die Ränder der Verteilung,
+        # die vollständige Liste ginge bei jeder Ausführung komplett an den Browser
+        if len(summary.member_rates.columns) > 1:
+            st.subheader("Quoten je Mitglied")
+            col1, col2, col3 = st.columns([2, 2, 1])
+            rate = col1.selectbox("Quote:", options=list(summary.member_rates.columns[1:]), key='rates_column')
+            lowest = col2.radio("Anzeigen:", options=["Niedrigste", "Höchste"], horizontal=True,
+                                key='rates_direction') == "Niedrigste"
+            count = col3.number_input("Mitglieder:", min_value=1, max_value=max(len(summary.member_rates), 1),
+                                      value=min(20, max(len(summary.member_rates), 1)), step=10, key='rates_count')
+            show_table(
+                summary.rate_extremes(rate, count, lowest),
+                column_config={
+                    'Anwesenheitsquote': st.column_config.ProgressColumn(
+                        'Anwesenheitsquote', min_value=0.0, max_value=1.0, format="percent"
+                    ),
+                    'Empfehlungsverhältnis': st.column_config.NumberColumn('Empfehlungsverhältnis', format="%.2f"),
+                },
+                hide_index=True
+            )
+            st.caption(f"{min(count, len(summary.member_rates))} von {len(summary.member_rates)} Mitgliedern; "
+                       "alle Mitglieder mit ihren Kennzahlen enthält der Export der Rohdaten.")
         
-        if df is not None:
-            # Bereinige die Spaltennamen
-            df.columns = df.columns.str.strip()
-            
-            # Erkenne das Dateiformat
-            file_format = detect_file_format(df)
+        # Summen je Bericht, wenn mehrere Dateien geladen sind
+        if summary.by_source is not None:
+            st.subheader("Summen je Bericht")
+            st.dataframe(summary.by_source)
+
+@st.fragment
+def render_scores(scores, profile):
+    """Tab Ampel-Ranking: alle Mitglieder nach Ampelpunkten mit Punkten je Bestandteil."""
+    with timed_section("Ampel-Ranking"):
+        st.header("Ampel-Ranking")
+        
+        counts = scores.light_counts()
+        for column, (light, count) in zip(st.columns(len(counts)), counts.items()):
+            column.metric(light, format_number(count))
+        
+        st.caption(f"Gewichtung: {profile}. Werte je Woche, Wochen aus P + A + L + M + S bzw. 26 Wochen "
+                   "ohne Anwesenheitsspalten. Ampelpunkte auf 100 umgerechnet; "
+                   "Grün ab 70, Gelb ab 50, Rot ab 30, darunter Grau.")
+        
+        ranking = scores.ranking()
+        col1, col2 = st.columns([2, 1])
+        lights = col1.multiselect("Ampelfarben:", options=list(counts.index), default=list(counts.index))
+        places = col2.number_input("Plätze anzeigen:", min_value=1, max_value=max(len(ranking), 1),
+                                   value=min(100, max(len(ranking), 1)), step=50)
+        if len(lights) < len(counts):
+            ranking = ranking[ranking[LIGHT_COLUMN].isin(lights)]
+        show_table(
+            ranking.head(places).round(1),
+            column_config={
+                SCORE_COLUMN: st.column_config.ProgressColumn(SCORE_COLUMN, min_value=0, max_value=100, format="%.0f"),
+                'Wochen': st.column_config.NumberColumn('Wochen', format="%d"),
+            }
+        )
+
+@st.fragment
+def render_member_comparison(df, schema, members):
+    """Tab Mitgliedervergleich; Auswahländerungen führen nur dieses Fragment neu aus."""
+    with timed_section("Mitgliedervergleich"):
+        st.header("Mitgliedervergleich")
+    
+        # Mitgliederauswahl für detaillierten Vergleich
+        col1, col2 = st.columns([1, 2])
+    
+        with col1:
+            st.subheader("Mitglieder auswählen")
+    
+            all_members = members.options()
             
-            # Verarbeite die Daten je nach Format
-            if file_format == "pagisto":
-                # Für Pagisto-Format: Extrahiere Vor- und Nachnamen
-                if "Mitglied" in df.columns:
-                    df[['Vorname', 'Nachname']] = df['Mitglied'].str.split(' ', n=1, expand=True)
-                
-                # Konvertiere Spalten zu numerischen Werten
-                numeric_columns = ['Platzierung', 'Abwesenheit', 'Empfehlungen', 'Umsatzdanke', 
-                                  'Besucher', '121s', 'Testimonials', 'CTE', 'Punkte']
-                for col in numeric_columns:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Die Auswahl bleibt erhalten, während andere Tabs angezeigt werden
+            previous_members = members.known(st.session_state.get('selected_members', []))
             
-            elif file_format == "palms":
-                # Für PALMS-Format: Konvertiere Spalten zu numerischen Werten
-                numeric_columns = ['P', 'A', 'L', 'M', 'S', 'G (Eigenbedarf)', 'G (extern)', 
-                                  'R (Eigenbedarf)', 'R (extern)', 'V', '1-2-1', 'U', 'CTE', 'T']
-                for col in numeric_columns:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Suche nach Namensanfang, Nachname oder ähnlicher Schreibweise
+            query = st.text_input("Mitglied suchen:", placeholder="z.B. Müller oder Joerg Mueller")
+            if query:
+                found = members.lookup(query)
+                options = previous_members + [m for m in found if m not in previous_members]
+                if not found:
+                    st.caption("Kein passendes Mitglied gefunden.")
+            else:
+                options = all_members
             
-            return df, file_format, None
+            selected_members = st.multiselect(
+                "Wählen Sie Mitglieder zum Vergleichen:",
+                options=options,
+                default=previous_members or options[:min(3, len(options))]
+            )
+            st.session_state['selected_members'] = selected_members
+    
+            if not selected_members:
+                st.warning("Bitte wählen Sie mindestens ein Mitglied aus.")
+    
+            # Kennzahlen auswählen basierend auf dem Dateiformat
+            metrics_options = schema.metrics
+    
+            previous_metrics = [m for m in st.session_state.get('selected_metrics', []) if m in metrics_options]
+            selected_metrics = st.multiselect(
+                "Wählen Sie Kennzahlen zum Vergleichen:",
+                options=list(metrics_options.keys()),
+                default=previous_metrics or list(metrics_options.keys())[:min(5, len(metrics_options))]
+            )
+            st.session_state['selected_metrics'] = selected_metrics
+    
+        with col2:
+            if selected_members and selected_metrics:
+                st.subheader("Vergleich der ausgewählten Mitglieder")
+    
+                # Filtere Daten für ausgewählte Mitglieder
+                df_selected = df[members.mask(selected_members)]
+    
+                # Bereite Daten für Diagramm vor (Langformat: Mitglied/Kennzahl/Wert)
+                with perf_stage("aufbereitung", "Langformat (melt)", rows=len(df_selected)):
+                    plot_df = long_format(
+                        df_selected,
+                        'Mitglied',
+                        [metrics_options[m] for m in selected_metrics],
+                        var_name='Kennzahl',
+                        value_name='Wert',
+                        labels={metrics_options[m]: m for m in selected_metrics}
+                    )
+    
+                if not plot_df.empty:
+                    # Erstelle Vergleichsdiagramm
+                    show_bar_chart(plot_df, x='Mitglied', y='Wert', hue='Kennzahl')
+    
+                    # Zeige Tabelle mit ausgewählten Kennzahlen
+                    st.subheader("Detaillierte Daten")
+                    columns_to_show = schema.name_columns + [metrics_options[m] for m in selected_metrics if metrics_options[m] in df_selected.columns]
+                    show_table(df_selected[columns_to_show])
+                else:
+                    st.warning("Keine Daten für die ausgewählten Kennzahlen gefunden.")
+
+@st.fragment
+def render_attendance(df_display, schema):
+    """Tab Anwesenheit & Empfehlungen."""
+    with timed_section("Anwesenheit & Empfehlungen"):
+        st.header("Anwesenheit & Empfehlungen")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            # Anwesenheitsstatistiken
+            st.subheader("Anwesenheitsstatistiken")
+            show_metric_group(df_display, schema, schema.attendance, var_name='Status')
+    
+        with col2:
+            # Empfehlungsstatistiken
+            st.subheader("Empfehlungsstatistiken")
+            show_metric_group(df_display, schema, schema.referrals, var_name='Typ')
+
+@st.fragment
+def render_activity(df_display, schema):
+    """Tab Besucher & 1-2-1."""
+    with timed_section("Besucher & 1-2-1"):
+        st.header("Besucher & 1-2-1 Meetings")
+    
+        # Besucher und 1-2-1 Vergleich
+        show_metric_group(df_display, schema, schema.activity, var_name='Kategorie', figsize=(12, 6))
+
+@st.fragment
+def render_revenue(df_display, schema):
+    """Tab Umsatz & Bildung."""
+    with timed_section("Umsatz & Bildung"):
+        st.header("Umsatz & Bildung")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            # Umsatzverteilung
+            st.subheader("Umsatz pro Mitglied")
+            show_metric_group(df_display, schema, schema.revenue, var_name='Kategorie', ylabel='Umsatz (€)')
+    
+        with col2:
+            # CTE und Testimonials
+            st.subheader("CTE und Testimonials pro Mitglied")
+            show_metric_group(df_display, schema, schema.education, var_name='Kategorie')
+
+@st.fragment
+def render_history(file_format, sort_options):
+    """Tab Verlauf aus der SQLite-Datenbank."""
+    with timed_section("Verlauf"):
+        st.header("Verlauf")
+    
+        history = get_history_store()
+        history_reports = history.reports()
+        history_reports = history_reports[history_reports['file_format'] == file_format]
+    
+        if history_reports.empty:
+            st.info("Es sind noch keine Berichte in diesem Format im Verlauf gespeichert. "
+                    "Speichern Sie den aktuellen Bericht über die Seitenleiste.")
         else:
-            # Wenn alle Methoden fehlgeschlagen sind, gib die Fehlermeldungen zurück
-            return None, None, "\n".join(error_messages)
+            col1, col2 = st.columns([1, 2])
     
-    except Exception as e:
-        return None, None, f"Fehler beim Laden der Datei: {str(e)}"
+            with col1:
+                trend_metric = st.selectbox(
+                    "Kennzahl:",
+                    options=list(sort_options.keys())
+                )
+    
+                history_members = history.members(file_format)
+                trend_members = st.multiselect(
+                    "Mitglieder:",
+                    options=history_members,
+                    default=history_members[:min(5, len(history_members))]
+                )
+    
+                st.caption(f"{len(history_reports)} Berichte von {history_reports['period'].min()} "
+                           f"bis {history_reports['period'].max()}")
+    
+            with col2:
+                trend = history.trend(file_format, sort_options[trend_metric], trend_members)
+    
+                if trend.empty:
+                    st.warning("Keine Verlaufsdaten für die Auswahl gefunden.")
+                else:
+                    show_line_chart(trend.reset_index(), x='period', ylabel=trend_metric)
+                    st.dataframe(trend)
 
-# Funktion zum Erstellen eines herunterladbaren Links
-def get_download_link(df, filename="bni_data.csv"):
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download als CSV</a>'
-    return href
+# Zeilenpositionen der Rohdaten nach Filter und Sortierung, ohne den DataFrame zu kopieren
+def raw_data_positions(df, sort_index, query, sort_column, ascending):
+    if sort_column in sort_index:
+        positions = sort_index.positions(sort_column, ascending)
+    else:
+        positions = np.arange(len(df))
+    
+    if query:
+        # Gesucht wird in den Kategorien, nicht in jeder Zeile
+        names = df['Mitglied']
+        matches = names.cat.categories.str.contains(query, case=False, regex=False)
+        keep = np.isin(names.cat.codes.to_numpy(), np.flatnonzero(matches))
+        positions = positions[keep[positions]]
+    return positions
+
+@st.fragment
+def render_raw_data(df, schema):
+    """Rohdaten seitenweise; es wird nur die sichtbare Seite an den Browser geschickt."""
+    with timed_section("Rohdaten"):
+        st.header("Rohdaten")
+        
+        # Export der Daten
+        show_export(df, "raw")
+        
+        # Ohne Aufklappen wird nichts übertragen
+        if not st.toggle(f"Rohdaten anzeigen ({len(df)} Zeilen)", key='raw_visible'):
+            return
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        query = col1.text_input("Mitglied enthält:", key='raw_query')
+        sort_label = col2.selectbox(
+            "Sortieren nach:", options=["Originalreihenfolge"] + list(schema.metrics), key='raw_sort'
+        )
+        ascending = col3.checkbox("Aufsteigend", value=False, key='raw_ascending')
+        
+        sort_index = get_sort_index(df, st.session_state['data_token'], schema.name)
+        sort_column = schema.metrics.get(sort_label)
+        positions = raw_data_positions(df, sort_index, query.strip(), sort_column, ascending)
+        
+        col1, col2 = st.columns([1, 1])
+        page_size = col1.selectbox("Zeilen pro Seite:", options=[25, 50, 100, 250], index=1, key='raw_page_size')
+        pages = max(1, -(-len(positions) // page_size))
+        # Die Seite steht nur im Session State (kein value=); nach einem engeren Filter
+        # kann die gemerkte Seite nicht mehr existieren
+        st.session_state.setdefault('raw_page', 1)
+        if st.session_state['raw_page'] > pages:
+            st.session_state['raw_page'] = pages
+        page = col2.number_input("Seite:", min_value=1, max_value=pages, step=1, key='raw_page')
+        
+        start = (page - 1) * page_size
+        window = positions[start:start + page_size]
+        show_table(df.iloc[window])
+        st.caption(f"Zeilen {start + 1 if len(window) else 0}–{start + len(window)} von {len(positions)}"
+                   + (f" (gefiltert aus {len(df)})" if len(positions) != len(df) else ""))
 
 # Sidebar für Datei-Upload und Filteroptionen
 with st.sidebar:
     st.header("Daten-Upload")
-    uploaded_file = st.file_uploader("BNI-Bericht hochladen (CSV oder Excel)", type=['csv', 'xls', 'xlsx'])
+    uploaded_files = st.file_uploader(
+        "BNI-Berichte hochladen (CSV oder Excel)",
+        type=['csv', 'xls', 'xlsx'],
+        accept_multiple_files=True,
+        help="Mehrere Berichte (z.B. Chapter oder Monate) werden parallel eingelesen "
+             "und mit den Spalten 'Quelle' und 'Periode' zusammengeführt."
+    )
     
-    if uploaded_file is not None:
-        df, file_format, error = load_data(uploaded_file)
+    if uploaded_files:
+        chunked = st.checkbox(
+            "Großer Export: stückweise einlesen",
+            value=False,
+            help="Für Exporte über viele Chapter: Die Datei wird in Stücken gelesen und "
+                 "mehrfach vorkommende Mitglieder werden zusammengefasst (Summen je Mitglied)."
+        )
+        data_token = (tuple(f.file_id for f in uploaded_files), chunked)
+        with timed_section("Laden"):
+            df, file_format, error, sniffs = load_data(uploaded_files, data_token)
         
+        # Zeige, wie das Format erkannt wurde
+        if sniffs:
+            with st.expander("Formaterkennung"):
+                for name, sniff in sniffs:
+                    st.markdown(f"**{name}:** {sniff.describe()}")
+                    st.markdown("\n".join(f"- {reason}" for reason in sniff.reasons))
+                    st.caption(f"Erkennung: {sniff.sniff_ms:.1f} ms | Einlesen: {sniff.parse_ms:.1f} ms")
+
+            # Datenqualität: Zellen, die sich nicht als Zahl lesen ließen
+            coerced = [(name, col, n) for name, sniff in sniffs for col, n in sniff.coerced_nan.items()]
+            if coerced:
+                st.warning(
+                    "Nicht lesbare Zahlenwerte (als leer gewertet): "
+                    + ", ".join(f"{col}: {n}" + (f" ({name})" if len(sniffs) > 1 else "")
+                                for name, col, n in coerced)
+                )
+            
+            # Spalten des erkannten Formats, die im Bericht fehlen
+            missing = [(name, sniff.missing_columns) for name, sniff in sniffs if sniff.missing_columns]
+            if missing:
+                st.info(
+                    "Im Bericht fehlende Spalten (zugehörige Kennzahlen bleiben leer): "
+                    + "; ".join(", ".join(columns) + (f" ({name})" if len(sniffs) > 1 else "")
+                                for name, columns in missing)
+                )
+
+        cache_stats = get_data_cache().stats()
+        st.caption(
+            f"Cache: {cache_stats['hits']} Treffer, {cache_stats['misses']} Fehlversuche, "
+            f"{cache_stats['entries']} Einträge ({cache_stats['size_mb']} / {cache_stats['max_mb']} MB)"
+        )
+        
+        if error or df is None:
+            # Der zuvor geladene Bericht gilt nicht mehr; Sortier- und Ampeloptionen
+            # werden nur für gültige Daten angelegt
+            st.session_state['file_loaded'] = False
+            st.session_state.pop('data', None)
         if error:
             st.error(f"Fehler beim Laden der Datei:\n{error}")
             st.info("Bitte stellen Sie sicher, dass die Datei im richtigen Format vorliegt und versuchen Sie es erneut.")
@@ -150,50 +626,45 @@ with st.sidebar:
             st.session_state['data'] = df
             st.session_state['file_format'] = file_format
             st.session_state['file_loaded'] = True
+            st.session_state['data_token'] = data_token
             
-            # Zeige Download-Link
-            st.markdown(get_download_link(df), unsafe_allow_html=True)
+            # Schritte des Einlesens einmal je Datensatz protokollieren
+            recorder = perf_recorder()
+            if recorder is not None and st.session_state.get('perf_data_token') != st.session_state['data_token']:
+                for name, sniff in sniffs:
+                    stages = {"sniff": sniff.sniff_ms, "parse": sniff.parse_ms, **sniff.stage_ms}
+                    for stage, ms in stages.items():
+                        recorder.record("einlesen", stage, ms, file=name, rows=len(df))
+                st.session_state['perf_data_token'] = st.session_state['data_token']
+            
+            # Die Startseite kam ohne Diagramm-Bibliotheken aus; jetzt werden sie gebraucht
+            if PREWARM:
+                prewarm(on_done=(lambda ms: recorder.record("start", "vorladen", ms))
+                        if recorder is not None else None)
+            
+            # Export der aufbereiteten Daten
+            show_export(df, "sidebar")
             
             # Filteroptionen
             st.header("Filter und Sortierung")
             
             # Sortierkriterium basierend auf dem Dateiformat
-            if file_format == "pagisto":
-                sort_options = {
-                    'Platzierung': 'Platzierung',
-                    'Abwesenheit': 'Abwesenheit',
-                    'Empfehlungen': 'Empfehlungen',
-                    'Umsatz': 'Umsatzdanke',
-                    'Besucher': 'Besucher',
-                    '1-2-1 Meetings': '121s',
-                    'Testimonials': 'Testimonials',
-                    'CTE': 'CTE',
-                    'Punkte': 'Punkte'
-                }
-            else:  # palms
-                sort_options = {
-                    'Anwesenheit (P)': 'P',
-                    'Abwesenheit (A)': 'A',
-                    'Verspätung (L)': 'L',
-                    'Medizinisch (M)': 'M',
-                    'Vertretung (S)': 'S',
-                    'Empfehlungen gegeben intern': 'G (Eigenbedarf)',
-                    'Empfehlungen gegeben extern': 'G (extern)',
-                    'Empfehlungen erhalten intern': 'R (Eigenbedarf)',
-                    'Empfehlungen erhalten extern': 'R (extern)',
-                    'Besucher (V)': 'V',
-                    '1-2-1 Meetings': '1-2-1',
-                    'Umsatz (U)': 'U',
-                    'CTE': 'CTE',
-                    'Testimonials (T)': 'T'
-                }
+            sort_options = SCHEMAS[file_format].metrics
             
+            # Ampelpunkte gibt es für beide Formate, auch ohne Punkte-Spalte im Bericht
             selected_sort = st.selectbox(
                 "Sortieren nach:",
-                options=list(sort_options.keys()),
+                options=list(sort_options.keys()) + [SCORE_COLUMN],
                 index=0
             )
             
+            score_profile = st.selectbox(
+                "Ampel-Gewichtung:",
+                options=list(get_score_profiles()),
+                key='score_profile',
+                help="Höchstpunkte je Bestandteil der Ampelbewertung; eigene Profile per BNI_SCORE_PROFILES (JSON)."
+            )
+            
             sort_ascending = st.checkbox("Aufsteigend sortieren", value=False)
             
             # Anzahl der anzuzeigenden Mitglieder
@@ -205,6 +676,58 @@ with st.sidebar:
                     max_value=max_members,
                     value=min(10, max_members)
                 )
+            
+            # Interaktive Diagramme werden im Browser gezeichnet, ohne Rerun bei Hover und Zoom
+            st.radio(
+                "Diagramme:",
+                options=list(CHART_BACKENDS),
+                format_func=CHART_BACKENDS.get,
+                index=list(CHART_BACKENDS).index(DEFAULT_CHART_BACKEND) if DEFAULT_CHART_BACKEND in CHART_BACKENDS else 0,
+                key='chart_backend'
+            )
+            
+            # Bericht mit Berichtsdatum im Verlauf speichern
+            st.header("Verlauf")
+            if len(uploaded_files) == 1:
+                uploaded_file = uploaded_files[0]
+                history_period = st.date_input(
+                    "Berichtsdatum:",
+                    value=report_period(df, uploaded_file.name) or datetime.date.today(),
+                    format="DD.MM.YYYY"
+                )
+                history_reports = [(uploaded_file, df, history_period)]
+            else:
+                # Jeder Bericht wird mit seinem eigenen Datum (Spalte oder Dateiname) gespeichert
+                st.caption("Jeder Bericht wird mit dem Datum aus der Datei oder dem Dateinamen gespeichert.")
+                files_by_name = {f.name: f for f in uploaded_files}
+                history_reports = [
+                    (files_by_name[source], part, part['Periode'].iloc[0])
+                    for source, part in df.groupby('Quelle', observed=True, sort=False)
+                ]
+            
+            if st.button("Im Verlauf speichern"):
+                for report_file, report_df, history_period in history_reports:
+                    if pd.isna(history_period):
+                        st.warning(f"{report_file.name}: Kein Berichtsdatum gefunden, nicht gespeichert.")
+                        continue
+                    history_status = get_history_store().append(
+                        report_df, file_format, history_period,
+                        content_hash(report_file.getvalue()), report_file.name
+                    )
+                    if history_status == "unverändert":
+                        st.info(f"{report_file.name} ist bereits im Verlauf gespeichert.")
+                    elif history_status == "ersetzt":
+                        st.success(f"Bericht für {history_period:%d.%m.%Y} im Verlauf ersetzt.")
+                    else:
+                        st.success(f"Bericht für {history_period:%d.%m.%Y} im Verlauf gespeichert.")
+    
+    st.checkbox(
+        "Performance-Messung",
+        value=DEFAULT_PERF,
+        key='perf_enabled',
+        help="Misst Einlesen, Aufbereitung, Diagramme und Abschnitte dieser Sitzung. "
+             "Mit BNI_PERF_LOG werden die Messungen zusätzlich als JSON Lines in eine Datei geschrieben."
+    )
     
     # Hilfe-Bereich
     st.header("Hilfe")
@@ -218,348 +741,63 @@ with st.sidebar:
     Das Dashboard unterstützt sowohl das Pagisto-Format als auch das PALMS-Format.
     """)
 
-# Hauptbereich für Visualisierungen
-if 'file_loaded' in st.session_state and st.session_state['file_loaded']:
+# Hauptbereich für Visualisierungen; nur mit Dateien dieses Laufs, sonst fehlen die Optionen der Sidebar
+if uploaded_files and st.session_state.get('file_loaded'):
     df = st.session_state['data']
     file_format = st.session_state['file_format']
+    schema = SCHEMAS[file_format]
     
-    # Sortiere Daten nach ausgewähltem Kriterium
-    sort_column = sort_options[selected_sort]
-    if sort_column in df.columns:
-        df_sorted = df.sort_values(by=sort_column, ascending=sort_ascending)
-    else:
-        st.warning(f"Die Spalte '{sort_column}' wurde nicht gefunden. Die Daten werden nicht sortiert.")
-        df_sorted = df
-    
-    # Begrenze auf ausgewählte Anzahl von Mitgliedern
-    df_display = df_sorted.head(num_members)
+    # Wähle die ersten Mitglieder nach dem Sortierkriterium aus der vorberechneten Reihenfolge
+    with timed_section("Sortierung"):
+        sort_column = sort_options.get(selected_sort)
+        sort_index = get_sort_index(df, st.session_state['data_token'], file_format)
+        if selected_sort == SCORE_COLUMN:
+            scores = get_member_scores(df, st.session_state['data_token'], file_format, score_profile)
+            df_display = df.iloc[scores.top(num_members, sort_ascending)]
+        elif sort_column in sort_index:
+            df_display = df.iloc[sort_index.top(sort_column, num_members, sort_ascending)]
+        else:
+            st.warning(f"Die Spalte '{sort_column}' wurde nicht gefunden. Die Daten werden nicht sortiert.")
+            df_display = df.head(num_members)
     
-    # Tabs für verschiedene Visualisierungen
-    tab1, tab2, tab3, tab4 = st.tabs([
+    # Tabs für verschiedene Visualisierungen; es wird nur der gewählte Tab
+    # gerendert, die anderen kosten bei einem Rerun keine Rechenzeit. Jeder Tab
+    # ist ein Fragment: Eingaben innerhalb eines Tabs führen nur ihn neu aus
+    tab_names = [
+        "Chapter-Übersicht",
+        "Ampel-Ranking",
         "Mitgliedervergleich", 
         "Anwesenheit & Empfehlungen", 
         "Besucher & 1-2-1", 
-        "Umsatz & Bildung"
-    ])
+        "Umsatz & Bildung",
+        "Verlauf"
+    ]
+    active_tab = st.radio("Ansicht", tab_names, horizontal=True, label_visibility="collapsed", key="active_tab")
     
-    with tab1:
-        st.header("Mitgliedervergleich")
-        
-        # Mitgliederauswahl für detaillierten Vergleich
-        col1, col2 = st.columns([1, 2])
-        
-        with col1:
-            st.subheader("Mitglieder auswählen")
-            
-            # Wähle die richtige Spalte für die Mitgliedernamen
-            if file_format == "pagisto":
-                all_members = df['Mitglied'].tolist()
-            else:  # palms
-                all_members = df['Nachname'].tolist()
-                
-            selected_members = st.multiselect(
-                "Wählen Sie Mitglieder zum Vergleichen:",
-                options=all_members,
-                default=all_members[:min(3, len(all_members))]
-            )
-            
-            if not selected_members:
-                st.warning("Bitte wählen Sie mindestens ein Mitglied aus.")
-            
-            # Kennzahlen auswählen basierend auf dem Dateiformat
-            if file_format == "pagisto":
-                metrics_options = {
-                    'Platzierung': 'Platzierung',
-                    'Abwesenheit': 'Abwesenheit',
-                    'Empfehlungen': 'Empfehlungen',
-                    'Umsatz': 'Umsatzdanke',
-                    'Besucher': 'Besucher',
-                    '1-2-1 Meetings': '121s',
-                    'Testimonials': 'Testimonials',
-                    'CTE': 'CTE',
-                    'Punkte': 'Punkte'
-                }
-            else:  # palms
-                metrics_options = {
-                    'Anwesenheit (P)': 'P',
-                    'Abwesenheit (A)': 'A',
-                    'Verspätung (L)': 'L',
-                    'Medizinisch (M)': 'M',
-                    'Vertretung (S)': 'S',
-                    'Empfehlungen gegeben intern': 'G (Eigenbedarf)',
-                    'Empfehlungen gegeben extern': 'G (extern)',
-                    'Empfehlungen erhalten intern': 'R (Eigenbedarf)',
-                    'Empfehlungen erhalten extern': 'R (extern)',
-                    'Besucher (V)': 'V',
-                    '1-2-1 Meetings': '1-2-1',
-                    'Umsatz (U)': 'U',
-                    'CTE': 'CTE',
-                    'Testimonials (T)': 'T'
-                }
-            
-            selected_metrics = st.multiselect(
-                "Wählen Sie Kennzahlen zum Vergleichen:",
-                options=list(metrics_options.keys()),
-                default=list(metrics_options.keys())[:min(5, len(metrics_options))]
-            )
-        
-        with col2:
-            if selected_members and selected_metrics:
-                st.subheader("Vergleich der ausgewählten Mitglieder")
-                
-                # Filtere Daten für ausgewählte Mitglieder
-                if file_format == "pagisto":
-                    df_selected = df[df['Mitglied'].isin(selected_members)]
-                else:  # palms
-                    df_selected = df[df['Nachname'].isin(selected_members)]
-                
-                # Erstelle Vergleichsdiagramm
-                fig, ax = plt.subplots(figsize=(10, 6))
-                
-                # Bereite Daten für Diagramm vor
-                plot_data = []
-                for metric in selected_metrics:
-                    column = metrics_options[metric]
-                    if column in df_selected.columns:
-                        for _, row in df_selected.iterrows():
-                            member_name = row['Mitglied'] if file_format == "pagisto" else row['Nachname']
-                            plot_data.append({
-                                'Mitglied': member_name,
-                                'Kennzahl': metric,
-                                'Wert': row[column]
-                            })
-                
-                if plot_data:
-                    plot_df = pd.DataFrame(plot_data)
-                    
-                    # Erstelle Diagramm
-                    sns.barplot(x='Mitglied', y='Wert', hue='Kennzahl', data=plot_df, ax=ax)
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
-                    
-                    st.pyplot(fig)
-                    
-                    # Zeige Tabelle mit ausgewählten Kennzahlen
-                    st.subheader("Detaillierte Daten")
-                    
-                    # Wähle die richtigen Spalten basierend auf dem Format
-                    if file_format == "pagisto":
-                        columns_to_show = ['Mitglied'] + [metrics_options[m] for m in selected_metrics if metrics_options[m] in df_selected.columns]
-                    else:  # palms
-                        columns_to_show = ['Vorname', 'Nachname'] + [metrics_options[m] for m in selected_metrics if metrics_options[m] in df_selected.columns]
-                    
-                    st.dataframe(df_selected[columns_to_show])
-                else:
-                    st.warning("Keine Daten für die ausgewählten Kennzahlen gefunden.")
-    
-    with tab2:
-        st.header("Anwesenheit & Empfehlungen")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Anwesenheitsstatistiken
-            st.subheader("Anwesenheitsstatistiken")
-            
-            if file_format == "pagisto":
-                # Für Pagisto-Format: Zeige Abwesenheit
-                fig, ax = plt.subplots(figsize=(10, 6))
-                sns.barplot(x='Mitglied', y='Abwesenheit', data=df_display, ax=ax)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Mitglied', 'Abwesenheit']])
-                
-            else:  # palms
-                # Für PALMS-Format: Zeige P, A, L, M, S
-                fig, ax = plt.subplots(figsize=(10, 6))
-                attendance_data = pd.melt(
-                    df_display[['Nachname', 'P', 'A', 'L', 'M', 'S']], 
-                    id_vars=['Nachname'], 
-                    var_name='Status', 
-                    value_name='Anzahl'
-                )
-                
-                sns.barplot(x='Nachname', y='Anzahl', hue='Status', data=attendance_data, ax=ax)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Vorname', 'Nachname', 'P', 'A', 'L', 'M', 'S']])
-        
-        with col2:
-            # Empfehlungsstatistiken
-            st.subheader("Empfehlungsstatistiken")
-            
-            if file_format == "pagisto":
-                # Für Pagisto-Format: Zeige Empfehlungen
-                fig, ax = plt.subplots(figsize=(10, 6))
-                sns.barplot(x='Mitglied', y='Empfehlungen', data=df_display, ax=ax)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Mitglied', 'Empfehlungen']])
-                
-            else:  # palms
-                # Für PALMS-Format: Zeige G (Eigenbedarf), G (extern), etc.
-                fig, ax = plt.subplots(figsize=(10, 6))
-                referrals_given = pd.melt(
-                    df_display[['Nachname', 'G (Eigenbedarf)', 'G (extern)']], 
-                    id_vars=['Nachname'], 
-                    var_name='Typ', 
-                    value_name='Anzahl'
-                )
-                
-                # Ersetze die Spaltennamen für bessere Lesbarkeit
-                referrals_given['Typ'] = referrals_given['Typ'].replace({
-                    'G (Eigenbedarf)': 'Intern gegeben',
-                    'G (extern)': 'Extern gegeben'
-                })
-                
-                sns.barplot(x='Nachname', y='Anzahl', hue='Typ', data=referrals_given, ax=ax)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Vorname', 'Nachname', 'G (Eigenbedarf)', 'G (extern)', 'R (Eigenbedarf)', 'R (extern)']])
-    
-    with tab3:
-        st.header("Besucher & 1-2-1 Meetings")
-        
-        # Besucher und 1-2-1 Vergleich
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        if file_format == "pagisto":
-            # Für Pagisto-Format
-            visitors_121 = df_display[['Mitglied', 'Besucher', '121s']]
-            visitors_121_melted = pd.melt(
-                visitors_121, 
-                id_vars=['Mitglied'], 
-                var_name='Kategorie', 
-                value_name='Anzahl'
-            )
-            
-            # Ersetze die Spaltennamen für bessere Lesbarkeit
-            visitors_121_melted['Kategorie'] = visitors_121_melted['Kategorie'].replace({
-                'Besucher': 'Besucher',
-                '121s': '1-2-1 Meetings'
-            })
-            
-            sns.barplot(x='Mitglied', y='Anzahl', hue='Kategorie', data=visitors_121_melted, ax=ax)
-            
-            # Zeige Tabelle
-            st.dataframe(df_display[['Mitglied', 'Besucher', '121s']])
-            
-        else:  # palms
-            # Für PALMS-Format
-            visitors_121 = df_display[['Nachname', 'V', '1-2-1']]
-            visitors_121_melted = pd.melt(
-                visitors_121, 
-                id_vars=['Nachname'], 
-                var_name='Kategorie', 
-                value_name='Anzahl'
-            )
-            
-            # Ersetze die Spaltennamen für bessere Lesbarkeit
-            visitors_121_melted['Kategorie'] = visitors_121_melted['Kategorie'].replace({
-                'V': 'Besucher',
-                '1-2-1': '1-2-1 Meetings'
-            })
-            
-            sns.barplot(x='Nachname', y='Anzahl', hue='Kategorie', data=visitors_121_melted, ax=ax)
-            
-            # Zeige Tabelle
-            st.dataframe(df_display[['Vorname', 'Nachname', 'V', '1-2-1']])
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        st.pyplot(fig)
-    
-    with tab4:
-        st.header("Umsatz & Bildung")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Umsatzverteilung
-            st.subheader("Umsatz pro Mitglied")
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            if file_format == "pagisto":
-                # Für Pagisto-Format
-                sns.barplot(x='Mitglied', y='Umsatzdanke', data=df_display, ax=ax)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Mitglied', 'Umsatzdanke']])
-                
-            else:  # palms
-                # Für PALMS-Format
-                sns.barplot(x='Nachname', y='U', data=df_display, ax=ax)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Vorname', 'Nachname', 'U']])
-            
-            plt.xticks(rotation=45)
-            plt.ylabel('Umsatz (€)')
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        with col2:
-            # CTE und Testimonials
-            st.subheader("CTE und Testimonials pro Mitglied")
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            if file_format == "pagisto":
-                # Für Pagisto-Format
-                cte_testimonials = pd.melt(
-                    df_display[['Mitglied', 'CTE', 'Testimonials']], 
-                    id_vars=['Mitglied'], 
-                    var_name='Kategorie', 
-                    value_name='Anzahl'
-                )
-                
-                sns.barplot(x='Mitglied', y='Anzahl', hue='Kategorie', data=cte_testimonials, ax=ax)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Mitglied', 'CTE', 'Testimonials']])
-                
-            else:  # palms
-                # Für PALMS-Format
-                cte_testimonials = pd.melt(
-                    df_display[['Nachname', 'CTE', 'T']], 
-                    id_vars=['Nachname'], 
-                    var_name='Kategorie', 
-                    value_name='Anzahl'
-                )
-                
-                # Ersetze die Spaltennamen für bessere Lesbarkeit
-                cte_testimonials['Kategorie'] = cte_testimonials['Kategorie'].replace({
-                    'T': 'Testimonials'
-                })
-                
-                sns.barplot(x='Nachname', y='Anzahl', hue='Kategorie', data=cte_testimonials, ax=ax)
-                
-                # Zeige Tabelle
-                st.dataframe(df_display[['Vorname', 'Nachname', 'CTE', 'T']])
-            
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            st.pyplot(fig)
+    if active_tab == "Chapter-Übersicht":
+        render_chapter_summary(get_chapter_summary(df, st.session_state['data_token'], file_format))
+    elif active_tab == "Ampel-Ranking":
+        render_scores(get_member_scores(df, st.session_state['data_token'], file_format, score_profile),
+                      score_profile)
+    elif active_tab == "Mitgliedervergleich":
+        render_member_comparison(df, schema, get_member_index(df, st.session_state['data_token']))
+    elif active_tab == "Anwesenheit & Empfehlungen":
+        render_attendance(df_display, schema)
+    elif active_tab == "Besucher & 1-2-1":
+        render_activity(df_display, schema)
+    elif active_tab == "Umsatz & Bildung":
+        render_revenue(df_display, schema)
+    elif active_tab == "Verlauf":
+        render_history(file_format, sort_options)
     
-    # Rohdaten
-    st.header("Rohdaten")
-    st.dataframe(df)
+    render_raw_data(df, schema)
     
-    # Download-Button für die Daten
-    st.markdown(get_download_link(df), unsafe_allow_html=True)
+    # Übersicht, welche Abschnitte wie oft und wie lange gelaufen sind
+    with st.sidebar.expander("Laufzeiten"):
+        st.caption("Eingaben innerhalb eines Tabs führen nur diesen Abschnitt neu aus; "
+                   "Zähler gelten für diese Sitzung und werden beim nächsten vollständigen Lauf aktualisiert.")
+        timings = pd.DataFrame.from_dict(st.session_state.get('section_timings', {}), orient='index')
+        st.dataframe(timings.rename(columns={'ms': 'Zuletzt (ms)', 'runs': 'Ausführungen'}).round(1))
 
 else:
     # Startseite, wenn noch keine Daten geladen wurden
@@ -587,6 +825,27 @@ else:
     Laden Sie Ihre BNI-Berichtsdatei hoch, um zu beginnen!
     """)
 
+# Messwerte der Sitzung; steht am Ende, damit die Messungen dieses Laufs enthalten sind
+recorder = perf_recorder()
+if recorder is not None:
+    with st.sidebar.expander("Performance", expanded=True):
+        figure_stats = get_figure_cache().stats()
+        st.caption(
+            f"Arbeitsspeicher (RSS): {current_rss_mb():.0f} MB | Offene Figuren: {open_figure_count()} | "
+            f"Diagramm-Cache: {figure_stats['entries']} Bilder ({figure_stats['size_mb']} MB), "
+            f"{figure_stats['hits']} Treffer, {figure_stats['misses']} gerendert"
+        )
+        st.dataframe(recorder.summary())
+        st.caption("Importe schwerer Bibliotheken (erst bei Bedarf oder im Hintergrund geladen)")
+        st.dataframe(import_times())
+        st.download_button(
+            "Messungen als JSON",
+            data=recorder.to_jsonl(),
+            file_name=f"bni_perf_{recorder.session_id}.jsonl",
+            mime="application/x-ndjson",
+            on_click="ignore"
+        )
+
 # Footer
 st.markdown("---")
 st.markdown("BNI Chapter Gulda Dashboard | Erstellt für den Chapterdirektor")
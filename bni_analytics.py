@@ -0,0 +1,120 @@
+"""Chapter-Kennzahlen über alle Mitglieder eines geladenen Berichts.
+
+Alle Werte werden einmal je Datensatz vektorisiert berechnet: Summen, Mittelwerte
+und Perzentile über eine gemeinsame Matrix der Kennzahl-Spalten, dazu abgeleitete
+Quoten je Mitglied (Anwesenheit, Verhältnis gegebener zu erhaltenen Empfehlungen)
+und Kennzahlen für das ganze Chapter. Das Ergebnis wird im Dashboard zusammen mit
+den Daten gecacht.
+"""
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bni_schema import SCHEMAS
+from bni_sort import SortIndex
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+
+@dataclass(frozen=True)
+class ChapterSummary:
+    """Chapter-Kennzahlen (Name -> Wert), Verteilung je Kennzahl und Quoten je Mitglied."""
+    members: int
+    kpis: dict
+    metrics: pd.DataFrame
+    member_rates: pd.DataFrame
+    by_source: pd.DataFrame = None
+    rate_order: SortIndex = None
+
+    def rate_extremes(self, column, n, lowest=True):
+        """Die ``n`` Mitglieder mit der niedrigsten (bzw. höchsten) Quote ``column``; fehlende Quoten zuletzt."""
+        return self.member_rates.iloc[self.rate_order.top(column, n, ascending=lowest)]
+
+
+def _row_sum(df, columns):
+    """Zeilensumme der vorhandenen ``columns`` als float-Array, NaN zählt als 0; None ohne Spalten."""
+    columns = [col for col in columns if col in df.columns]
+    if not columns:
+        return None
+    return np.nansum(df[columns].to_numpy(dtype=float, na_value=np.nan), axis=1)
+
+
+def _ratio(numerator, denominator):
+    """Elementweise Quote; bei Nenner 0 NaN statt inf."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def metric_distribution(df, columns, labels=None):
+    """Summe, Mittelwert, Perzentile, Minimum und Maximum je Kennzahl in einem Durchgang."""
+    columns = [col for col in columns if col in df.columns]
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    with warnings.catch_warnings():
+        # Spalten ganz ohne Werte liefern NaN, die Warnung dazu ist erwartet
+        warnings.simplefilter('ignore', RuntimeWarning)
+        quantiles = np.nanpercentile(values, PERCENTILES, axis=0)
+        table = {
+            'Summe': np.nansum(values, axis=0),
+            'Mittelwert': np.nanmean(values, axis=0),
+            'Minimum': np.nanmin(values, axis=0),
+        }
+        for p, row in zip(PERCENTILES, quantiles):
+            table['Median' if p == 50 else f'P{p}'] = row
+        table['Maximum'] = np.nanmax(values, axis=0)
+    table['Mit Wert'] = np.count_nonzero(~np.isnan(values), axis=0)
+    index = [(labels or {}).get(col, col) for col in columns]
+    return pd.DataFrame(table, index=pd.Index(index, name='Kennzahl'))
+
+
+def chapter_summary(df, file_format):
+    """Berechnet alle Chapter-Kennzahlen für einen aufbereiteten Bericht."""
+    schema = SCHEMAS[file_format]
+    # Verschiedene Schreibweisen desselben Mitglieds zählen einmal
+    members = int(df['MitgliedID'].nunique()) if 'MitgliedID' in df.columns else int(df['Mitglied'].nunique())
+    labels = {col: name for name, col in schema.metrics.items()}
+    kpis = {'Mitglieder': members}
+
+    rates = pd.DataFrame({'Mitglied': df['Mitglied'].to_numpy()})
+
+    meetings = _row_sum(df, schema.meeting_columns)
+    present = _row_sum(df, schema.present_columns)
+    if meetings is not None and present is not None:
+        rates['Anwesenheitsquote'] = _ratio(present, meetings)
+        kpis['Anwesenheitsquote'] = _ratio(present.sum(), meetings.sum()).item()
+        if 'A' in df.columns:
+            kpis['Abwesenheitsquote'] = _ratio(np.nansum(df['A'].to_numpy(dtype=float, na_value=np.nan)),
+                                               meetings.sum()).item()
+
+    given = _row_sum(df, schema.given_columns)
+    received = _row_sum(df, schema.received_columns)
+    if given is not None:
+        kpis['Empfehlungen gegeben'] = float(given.sum())
+        kpis['Empfehlungen je Mitglied'] = float(given.sum() / members) if members else np.nan
+    if received is not None:
+        kpis['Empfehlungen erhalten'] = float(received.sum())
+    if given is not None and received is not None:
+        rates['Empfehlungsverhältnis'] = _ratio(given, received)
+        kpis['Empfehlungsverhältnis'] = _ratio(given.sum(), received.sum()).item()
+
+    if schema.revenue_column in df.columns:
+        revenue = df[schema.revenue_column].to_numpy(dtype=float, na_value=np.nan)
+        kpis['Umsatz gesamt'] = float(np.nansum(revenue))
+        kpis['Umsatz je Mitglied'] = float(np.nansum(revenue) / members) if members else np.nan
+
+    by_source = None
+    if 'Quelle' in df.columns:
+        columns = [col for col in schema.numeric_columns if col in df.columns and col != 'Platzierung']
+        grouped = df.groupby('Quelle', observed=True, sort=False)
+        by_source = grouped[columns].sum().rename(columns=labels)
+        by_source.insert(0, 'Mitglieder', grouped['MitgliedID' if 'MitgliedID' in df.columns else 'Mitglied'].nunique())
+
+    return ChapterSummary(
+        members=members,
+        kpis=kpis,
+        metrics=metric_distribution(df, schema.numeric_columns, labels),
+        member_rates=rates,
+        rate_order=SortIndex(rates, [col for col in rates.columns if col != 'Mitglied']),
+        by_source=by_source,
+    )
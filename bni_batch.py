@@ -0,0 +1,214 @@
+"""Berichte für viele Chapter ohne Streamlit erzeugen.
+
+Aufruf:
+    python bni_batch.py berichte/ ausgabe/ --output pdf png --workers 8
+
+Jede Datei im Eingabeverzeichnis gilt als ein Chapter. Sie wird wie im Dashboard
+eingelesen und aufbereitet; daraus entstehen eine Übersichtsseite mit den
+Chapter-Kennzahlen und die Diagramme der Dashboard-Tabs, als PDF mit einer Seite
+je Diagramm und/oder als einzelne PNG-Dateien. Die Dateien werden parallel in
+eigenen Prozessen verarbeitet.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from bni_analytics import chapter_summary
+from bni_charts import bar_chart_figure, long_format, metric_group_data
+from bni_loader import load_report, read_chunked
+from bni_schema import SCHEMAS
+from bni_scoring import SCORE_COLUMN, MemberScores
+from bni_sort import SortIndex
+
+REPORT_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+# Diagramme der Dashboard-Tabs: (Titel, Kennzahlgruppe, Legende, Achsenbeschriftung, Größe)
+REPORT_SECTIONS = [
+    ("Anwesenheitsstatistiken", "attendance", "Status", None, (10, 6)),
+    ("Empfehlungsstatistiken", "referrals", "Typ", None, (10, 6)),
+    ("Besucher & 1-2-1 Meetings", "activity", "Kategorie", None, (12, 6)),
+    ("Umsatz pro Mitglied", "revenue", "Kategorie", "Umsatz (€)", (10, 6)),
+    ("CTE und Testimonials pro Mitglied", "education", "Kategorie", None, (10, 6)),
+]
+
+
+def find_reports(directory):
+    """Alle Berichtsdateien im Verzeichnis, nach Namen sortiert."""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(REPORT_EXTENSIONS) and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def _slug(text):
+    """Dateiname aus einem Titel."""
+    return re.sub(r"[^\w-]+", "_", text).strip("_").lower()
+
+
+def _summary_figure(chapter, file_format, summary):
+    """Übersichtsseite mit den Chapter-Kennzahlen als Tabelle."""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.axis("off")
+    ax.set_title(f"{chapter} ({file_format})", fontsize=16, loc="left")
+    rows = []
+    for name, value in summary.kpis.items():
+        if "quote" in name:
+            rows.append([name, f"{value * 100:.1f} %"])
+        elif "Umsatz" in name:
+            rows.append([name, f"{value:,.0f} €".replace(",", ".")])
+        elif isinstance(value, float) and not value.is_integer():
+            rows.append([name, f"{value:.2f}".replace(".", ",")])
+        else:
+            rows.append([name, f"{value:,.0f}".replace(",", ".")])
+    table = ax.table(cellText=rows, colLabels=["Kennzahl", "Wert"], loc="upper left", cellLoc="left")
+    table.scale(1, 1.6)
+    return fig
+
+
+def chapter_figures(chapter, df, file_format, num_members=10, sort_label=None, ascending=False):
+    """Erzeugt nacheinander (Name, Figur) für Übersicht, Mitgliedervergleich und alle Tab-Diagramme."""
+    schema = SCHEMAS[file_format]
+    yield "uebersicht", _summary_figure(chapter, file_format, chapter_summary(df, file_format))
+
+    # Die ersten Mitglieder nach dem Sortierkriterium, wie in der Seitenleiste
+    if sort_label == SCORE_COLUMN:
+        df_display = df.iloc[MemberScores(df, file_format).top(num_members, ascending)]
+    else:
+        # Ein Kriterium des anderen Formats fällt auf die erste Kennzahl zurück
+        if sort_label not in schema.metrics:
+            sort_label = next(iter(schema.metrics))
+        sort_column = schema.metrics[sort_label]
+        sort_index = SortIndex(df, [sort_column])
+        if sort_column in sort_index:
+            df_display = df.iloc[sort_index.top(sort_column, num_members, ascending)]
+        else:
+            df_display = df.head(num_members)
+
+    # Mitgliedervergleich mit den ersten fünf Kennzahlen
+    metrics = {col: name for name, col in list(schema.metrics.items())[:5] if col in df.columns}
+    comparison = long_format(df_display, 'Mitglied', list(metrics), var_name='Kennzahl',
+                             value_name='Wert', labels=metrics)
+    yield "mitgliedervergleich", bar_chart_figure(
+        comparison, 'Mitglied', 'Wert', hue='Kennzahl', title=f"Mitgliedervergleich (nach {sort_label})"
+    )
+
+    for title, group_name, var_name, ylabel, figsize in REPORT_SECTIONS:
+        chart = metric_group_data(df_display, getattr(schema, group_name), var_name)
+        if chart is None:
+            continue
+        data, y, hue = chart
+        yield _slug(title), bar_chart_figure(data, 'Mitglied', y, hue=hue, figsize=figsize,
+                                             ylabel=ylabel, title=title)
+
+
+def build_chapter_report(path, output_dir, outputs=("pdf",), num_members=10, sort_label=None,
+                         ascending=False, chunked=False):
+    """Liest einen Bericht und schreibt PDF und/oder PNGs; liefert (Datei, Seiten, ms).
+
+    Läuft in einem Worker-Prozess und muss daher auf Modulebene stehen.
+    """
+    start = time.perf_counter()
+    filename = os.path.basename(path)
+    chapter = os.path.splitext(filename)[0]
+    if chunked:
+        df, file_format, _ = read_chunked(path, filename)
+    else:
+        with open(path, "rb") as f:
+            df, file_format, _ = load_report(f.read(), filename)
+
+    png_dir = os.path.join(output_dir, chapter)
+    if "png" in outputs:
+        os.makedirs(png_dir, exist_ok=True)
+    pdf = PdfPages(os.path.join(output_dir, f"{chapter}.pdf")) if "pdf" in outputs else None
+    pages = 0
+    try:
+        for i, (name, fig) in enumerate(chapter_figures(chapter, df, file_format, num_members,
+                                                        sort_label, ascending)):
+            try:
+                if pdf is not None:
+                    pdf.savefig(fig)
+                if "png" in outputs:
+                    fig.savefig(os.path.join(png_dir, f"{i:02d}_{name}.png"), dpi=150, bbox_inches="tight")
+            finally:
+                plt.close(fig)
+            pages += 1
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return filename, pages, (time.perf_counter() - start) * 1000
+
+
+def run_batch(paths, output_dir, outputs=("pdf",), workers=None, **options):
+    """Verarbeitet alle ``paths`` mit ``workers`` Prozessen; liefert die Zahl der Fehler."""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    errors = 0
+
+    if workers == 1:
+        results = []
+        for path in paths:
+            try:
+                results.append((path, build_chapter_report(path, output_dir, outputs, **options), None))
+            except Exception as e:
+                results.append((path, None, e))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(build_chapter_report, path, output_dir, outputs, **options): path
+                       for path in paths}
+            results = []
+            for future in as_completed(futures):
+                try:
+                    results.append((futures[future], future.result(), None))
+                except Exception as e:
+                    results.append((futures[future], None, e))
+
+    for path, result, error in sorted(results, key=lambda r: r[0]):
+        if error is not None:
+            errors += 1
+            print(f"FEHLER  {os.path.basename(path)}: {error}", file=sys.stderr)
+        else:
+            filename, pages, ms = result
+            print(f"OK      {filename}: {pages} Seiten in {ms:.0f} ms")
+
+    elapsed = time.perf_counter() - start
+    done = len(paths) - errors
+    print(f"{done} von {len(paths)} Chaptern in {elapsed:.1f} s "
+          f"({done / elapsed if elapsed else 0:.2f} Chapter/s, {workers} Prozesse)")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="Verzeichnis mit CSV- oder Excel-Berichten (eine Datei je Chapter)")
+    parser.add_argument("output_dir", help="Zielverzeichnis für PDFs und PNGs")
+    parser.add_argument("--output", nargs="+", choices=["pdf", "png"], default=["pdf"], help="Ausgabeformate")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--members", type=int, default=10, help="Anzahl Mitglieder je Diagramm")
+    parser.add_argument("--sort", default=None, help="Sortierkriterium, z.B. 'Ampelpunkte', 'Punkte' oder 'Anwesenheit (P)'")
+    parser.add_argument("--ascending", action="store_true", help="Aufsteigend sortieren")
+    parser.add_argument("--chunked", action="store_true", help="Große Exporte stückweise einlesen")
+    args = parser.parse_args(argv)
+
+    paths = find_reports(args.input_dir)
+    if not paths:
+        print(f"Keine Berichte in {args.input_dir} gefunden.", file=sys.stderr)
+        return 1
+    errors = run_batch(
+        paths, args.output_dir, tuple(args.output), args.workers,
+        num_members=args.members, sort_label=args.sort, ascending=args.ascending, chunked=args.chunked,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+"""Benchmarks für das Einlesen von BNI-Berichten.
+
+Aufruf:
+    python bni_bench.py ingest --sizes 1 50 200
+    python bni_bench.py chunked --sizes 10 50 200
+    python bni_bench.py parallel --files 1 2 4 8 16
+    python bni_bench.py suite --save-baseline
+    python bni_bench.py suite --members 10 1000 100000 --fail-on-regression
+    python bni_bench.py startup
+
+Die Messungen von ingest und chunked laufen in einem eigenen Prozess, damit der
+Spitzenwert des Arbeitsspeichers (peak RSS) nicht von vorherigen Läufen
+verfälscht wird. Die Suite misst Einlesen, Formaterkennung, Diagrammdaten und
+Rendering ohne Streamlit auf synthetischen Berichten und vergleicht mit einer
+Baseline-Datei. startup misst in frischen Prozessen, wie lange die Module des
+Dashboards bis zur Startseite importieren und welche schweren Bibliotheken
+dabei schon geladen werden.
+"""
+import argparse
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bni_cache import ParsedDataCache
+from bni_charts import chart_key, long_format, render_bar_chart
+from bni_imports import prewarm
+from bni_loader import (detect_file_format, load_report, merge_reports, parse_file, read_chunked,
+                        read_upload, sniff_format)
+from bni_schema import PAGISTO_NUMERIC_COLUMNS, PALMS_NUMERIC_COLUMNS, SCHEMAS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+FIRST_NAMES = ['Jörg', 'Anna', 'Björn', 'Eva', 'Märta', 'Lukas', 'Zoë', 'Ömer']
+LAST_NAMES = ['Müller', 'Schäfer', 'Groß', 'Weiß', 'Köhler', 'Bäcker', 'Nguyen', "O'Brien"]
+
+# Variante -> (Encoding, Trennzeichen, unsauber); None steht für eine Excel-Datei
+VARIANTS = {
+    "utf8-komma": ("utf-8", ",", False),
+    "cp1252-semikolon-unsauber": ("cp1252", ";", True),
+    "utf8bom-tab": ("utf-8-sig", "\t", False),
+    "xlsx": None,
+}
+
+# Excel-Dateien mit mehr Mitgliedern dauern mit openpyxl zu lange für einen Suite-Lauf
+EXCEL_MAX_MEMBERS = 10000
+
+# Anzahl Mitglieder, die ein Diagramm wie im Dashboard zeigt
+CHART_MEMBERS = 30
+
+
+def _peak_rss_mb():
+    """Spitzenwert des Arbeitsspeichers dieses Prozesses in MB; NaN, wo es kein ``resource`` gibt (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KB, macOS Bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def write_palms_csv(path, size_mb, seed=0, members=10**6):
+    """Schreibt einen synthetischen PALMS-Bericht mit etwa ``size_mb`` MB.
+
+    ``members`` begrenzt die Zahl verschiedener Nachnamen, sodass Mitglieder
+    wie in Exporten über mehrere Chapter mehrfach vorkommen.
+    """
+    rng = np.random.default_rng(seed)
+    rows_per_block = 20000
+    written = 0
+    header = True
+    with open(path, "w", encoding="cp1252", newline="") as f:
+        while written < size_mb * 1024 * 1024:
+            block = pd.DataFrame({
+                'Vorname': rng.choice(['Jörg', 'Anna', 'Björn', 'Eva'], rows_per_block),
+                'Nachname': [f"Müller{i}" for i in rng.integers(0, members, rows_per_block)],
+            })
+            for col in PALMS_NUMERIC_COLUMNS:
+                block[col] = rng.integers(0, 30, rows_per_block)
+            block.to_csv(f, sep=';', index=False, header=header)
+            header = False
+            written = f.tell()
+
+
+def synthetic_report(file_format, members, seed=0):
+    """Synthetischer Bericht im Pagisto- oder PALMS-Format mit ``members`` Mitgliedern."""
+    rng = np.random.default_rng(seed)
+    first = rng.choice(FIRST_NAMES, members)
+    last = [f"{name}{i}" for i, name in enumerate(rng.choice(LAST_NAMES, members))]
+    if file_format == "pagisto":
+        df = pd.DataFrame({
+            'Datum': '08.01.2026',
+            'Mitglied': [f"{a} {b}" for a, b in zip(first, last)],
+        })
+        for col in PAGISTO_NUMERIC_COLUMNS:
+            df[col] = rng.integers(0, 30, members)
+        df['Platzierung'] = rng.permutation(members) + 1
+        df['Umsatzdanke'] = rng.integers(0, 500000, members) / 100
+    else:
+        df = pd.DataFrame({'Vorname': first, 'Nachname': last})
+        for col in PALMS_NUMERIC_COLUMNS:
+            df[col] = rng.integers(0, 30, members)
+        df['U'] = rng.integers(0, 500000, members) / 100
+    return df
+
+
+def encode_report(df, variant, seed=0):
+    """Schreibt einen Bericht als Datei der Variante ``variant`` (siehe VARIANTS) und liefert die Bytes.
+
+    Unsaubere Varianten enthalten Beträge im deutschen Format mit Euro-Zeichen,
+    leere Zellen und Leerzeichen in den Spaltennamen.
+    """
+    buffer = io.BytesIO()
+    if VARIANTS[variant] is None:
+        df.to_excel(buffer, index=False, engine="openpyxl")
+        return buffer.getvalue()
+
+    encoding, separator, messy = VARIANTS[variant]
+    if messy:
+        rng = np.random.default_rng(seed)
+        df = df.copy()
+        amount = 'U' if 'U' in df.columns else 'Umsatzdanke'
+        df[amount] = [f"{value:,.2f} €".replace(',', 'X').replace('.', ',').replace('X', '.')
+                      for value in df[amount]]
+        blank = df.columns[-1]
+        df[blank] = df[blank].astype(object).where(rng.random(len(df)) > 0.05, '')
+        df.columns = [f" {col} " for col in df.columns]
+    df.to_csv(buffer, sep=separator, index=False, encoding=encoding)
+    return buffer.getvalue()
+
+
+def _median_ms(func, repeat):
+    """Median der Laufzeit von ``func`` über ``repeat`` Läufe in ms."""
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def bench_suite(member_counts, repeat, formats=("palms", "pagisto"), variants=tuple(VARIANTS)):
+    """Misst alle Stufen für jede Kombination aus Format, Variante und Mitgliederzahl.
+
+    Liefert ein Dict ``"format/variante/mitglieder/stufe" -> ms``.
+    """
+    # Importzeiten der Diagramm- und Excel-Bibliotheken sollen nicht in die erste Messung fallen
+    prewarm().join()
+    results = {}
+    for file_format in formats:
+        schema = SCHEMAS[file_format]
+        for members in member_counts:
+            raw = synthetic_report(file_format, members)
+            for variant in variants:
+                if VARIANTS[variant] is None and members > EXCEL_MAX_MEMBERS:
+                    continue
+                data = encode_report(raw, variant)
+                filename = f"{file_format}.{'xlsx' if VARIANTS[variant] is None else 'csv'}"
+                prefix = f"{file_format}/{variant}/{members}"
+
+                df, detected, sniff = load_report(data, filename)
+                if detected != file_format:
+                    raise AssertionError(f"{prefix}: als {detected} erkannt")
+                results[f"{prefix}/load_report"] = _median_ms(lambda: load_report(data, filename), repeat)
+                results[f"{prefix}/sniff_format"] = _median_ms(lambda: sniff_format(data[:64 * 1024], filename), repeat)
+
+                columns_only = read_upload(data, filename)[0]
+                columns_only.columns = columns_only.columns.str.strip()
+                results[f"{prefix}/detect_file_format"] = _median_ms(lambda: detect_file_format(columns_only), repeat)
+
+            # Diagrammdaten und Rendering hängen nicht von der Dateivariante ab
+            prefix = f"{file_format}/-/{members}"
+            metric_columns = list(schema.attendance.columns)
+            display = df.head(CHART_MEMBERS)
+            results[f"{prefix}/long_format"] = _median_ms(
+                lambda: long_format(df, 'Mitglied', metric_columns, var_name='Status', value_name='Anzahl'), repeat
+            )
+            plot_df = long_format(display, 'Mitglied', metric_columns, var_name='Status', value_name='Anzahl')
+            results[f"{prefix}/chart_key"] = _median_ms(lambda: chart_key("bar", plot_df, x='Mitglied'), repeat)
+            results[f"{prefix}/render_bar_chart"] = _median_ms(
+                lambda: render_bar_chart(plot_df, 'Mitglied', 'Anzahl', hue='Status'), repeat
+            )
+    return results
+
+
+def compare_baseline(results, baseline, tolerance=0.25, min_ms=1.0):
+    """Messungen, die mehr als ``tolerance`` und mindestens ``min_ms`` langsamer als die Baseline sind."""
+    regressions = []
+    for key, ms in results.items():
+        base = baseline.get(key)
+        if base is not None and ms > base * (1 + tolerance) and ms - base >= min_ms:
+            regressions.append((key, base, ms))
+    return regressions
+
+
+def run_suite(args):
+    """Führt die Suite aus, vergleicht mit der Baseline und speichert sie auf Wunsch neu."""
+    results = bench_suite(args.members, args.repeat, formats=args.formats, variants=args.variants)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    regressions = {key for key, _, _ in compare_baseline(results, baseline, args.tolerance)}
+
+    print(f"{'Messung':<60} {'ms':>10} {'Baseline':>10} {'Änderung':>9}")
+    for key, ms in results.items():
+        base = baseline.get(key)
+        change = f"{(ms / base - 1) * 100:+.0f}%" if base else "neu"
+        flag = "  REGRESSION" if key in regressions else ""
+        print(f"{key:<60} {ms:>10.2f} {base if base is not None else '-':>10} {change:>9}{flag}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "pandas": pd.__version__,
+                    "platform": platform.platform(),
+                    "repeat": args.repeat,
+                },
+                "results": {key: round(ms, 3) for key, ms in results.items()},
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gespeichert: {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} Regression(en) gegenüber der Baseline (Toleranz {args.tolerance:.0%})")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def _read_via_tempfile(data, filename):
+    """Bisheriger Pfad: Upload in eine temporäre Datei schreiben und von dort lesen."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp_file:
+        tmp_file.write(data)
+        tmp_file_path = tmp_file.name
+    try:
+        sniff = sniff_format(data[:64 * 1024], filename)
+        return parse_file(tmp_file_path, sniff)
+    finally:
+        os.unlink(tmp_file_path)
+
+
+def _ingest_worker(path, mode):
+    """Misst einen einzelnen Einlesevorgang und gibt das Ergebnis als JSON aus."""
+    filename = os.path.basename(path)
+    data = None
+    if mode != "chunked":
+        with open(path, "rb") as f:
+            data = f.read()
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "tempfile":
+        df = _read_via_tempfile(data, filename)
+    elif mode == "memory":
+        df, _ = read_upload(data, filename)
+    elif mode == "oneshot":
+        df, _, _ = load_report(data, filename, aggregate=True)
+    else:
+        # Liest direkt von der Festplatte, ohne die ganze Datei in den Speicher zu holen
+        df, _, _ = read_chunked(path, filename)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "mode": mode,
+        "rows": len(df),
+        "ms": round(elapsed, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "delta_rss_mb": round(_peak_rss_mb() - baseline, 1),
+    }))
+
+
+def bench_ingest(sizes, repeat, modes=("tempfile", "memory"), members=10**6):
+    """Vergleicht die Einlesepfade ``modes`` für die angegebenen Dateigrößen."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes:
+            path = os.path.join(tmp_dir, f"palms_{size_mb}mb.csv")
+            write_palms_csv(path, size_mb, members=members)
+            for mode in modes:
+                for _ in range(repeat):
+                    out = subprocess.run(
+                        [sys.executable, __file__, "_ingest-worker", path, mode],
+                        check=True, capture_output=True, text=True,
+                        cwd=os.path.dirname(os.path.abspath(__file__)),
+                    ).stdout
+                    result = json.loads(out.strip().splitlines()[-1])
+                    result["size_mb"] = size_mb
+                    results.append(result)
+
+    print(f"{'Größe':>8} {'Modus':>9} {'Zeilen':>9} {'ms':>9} {'Peak MB':>9} {'Δ MB':>8}")
+    for r in results:
+        print(f"{r['size_mb']:>6}MB {r['mode']:>9} {r['rows']:>9} {r['ms']:>9} "
+              f"{r['peak_rss_mb']:>9} {r['delta_rss_mb']:>8}")
+    return results
+
+
+def verify_chunked(size_mb=5, chunk_rows=7000, members=5000):
+    """Prüft, dass stückweises Einlesen dasselbe Ergebnis liefert wie einmaliges Einlesen.
+
+    Neben dem PALMS-Export wird ein Pagisto-Export mit Semikolon und Beträgen mit
+    Tausenderpunkt ("1.250", ohne Dezimalkomma) geprüft, der um den Faktor 1000
+    daneben läge, wenn die Punkte als Dezimalpunkte gelesen würden.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "palms_verify.csv")
+        write_palms_csv(path, size_mb, members=members)
+        with open(path, "rb") as f:
+            data = f.read()
+        expected, _, _ = load_report(data, "palms_verify.csv", aggregate=True)
+        actual, _, _ = read_chunked(path, "palms_verify.csv", chunk_rows=chunk_rows)
+    pd.testing.assert_frame_equal(actual, expected)
+    print(f"Stückweises Einlesen identisch mit einmaligem Einlesen ({len(actual)} Mitglieder)")
+
+    # Jedes Mitglied kommt zweimal vor, wie in Exporten über mehrere Chapter
+    report = synthetic_report("pagisto", members)
+    report = pd.concat([report, report], ignore_index=True)
+    amounts = np.random.default_rng(1).integers(0, 50000, len(report))
+    report['Umsatzdanke'] = [f"{amount:,}".replace(',', '.') for amount in amounts]
+    data = report.to_csv(sep=';', index=False).encode("utf-8")
+    expected, _, _ = load_report(data, "pagisto_verify.csv", aggregate=True)
+    actual, _, _ = read_chunked(data, "pagisto_verify.csv", chunk_rows=chunk_rows)
+    pd.testing.assert_frame_equal(actual, expected)
+    total = actual['Umsatzdanke'].sum()
+    if total != amounts.sum():
+        raise AssertionError(f"Umsatz mit Tausenderpunkten falsch gelesen: {total} statt {amounts.sum()}")
+    print(f"Semikolon-Export mit Tausenderpunkten identisch und korrekt ({len(actual)} Mitglieder)")
+
+
+def bench_parallel(file_counts, size_mb, workers):
+    """Vergleicht serielles und paralleles Einlesen mehrerer Berichte (ohne Cache-Treffer)."""
+    workers = workers or os.cpu_count()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = []
+        for i in range(max(file_counts)):
+            path = os.path.join(tmp_dir, f"palms_2026-01-{i + 1:02d}.csv")
+            write_palms_csv(path, size_mb, seed=i, members=5000)
+            with open(path, "rb") as f:
+                files.append((os.path.basename(path), f.read()))
+
+        # Pool vorab starten, damit nur das Einlesen gemessen wird
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(time.sleep, [0] * workers))
+            for count in file_counts:
+                batch = files[:count]
+                timings = {}
+                for mode, executor in (("seriell", None), ("parallel", pool)):
+                    # Jeder Lauf mit leerem Cache, damit wirklich geparst wird
+                    with tempfile.TemporaryDirectory() as cache_dir:
+                        cache = ParsedDataCache(cache_dir, max_mb=0)
+                        start = time.perf_counter()
+                        loaded = cache.load_many(batch, load_report, executor=executor)
+                        merge_reports([(name, result[0]) for (name, _), result in zip(batch, loaded)])
+                        timings[mode] = (time.perf_counter() - start) * 1000
+                results.append({"files": count, **timings})
+
+    print(f"{'Dateien':>8} {'seriell ms':>11} {'parallel ms':>12} {'Faktor':>7}   ({workers} Worker)")
+    for r in results:
+        print(f"{r['files']:>8} {r['seriell']:>11.1f} {r['parallel']:>12.1f} {r['seriell'] / r['parallel']:>7.2f}")
+    return results
+
+
+# Module, die das Dashboard bis zur Startseite importiert
+APP_MODULES = ("bni_analytics", "bni_cache", "bni_charts", "bni_export", "bni_history", "bni_imports",
+               "bni_loader", "bni_members", "bni_perf", "bni_schema", "bni_scoring", "bni_sort")
+
+
+# Läuft mit "python -c" in einem frischen Prozess, ohne die Importe dieses Moduls
+STARTUP_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import streamlit
+base = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+app = time.perf_counter()
+from bni_imports import HEAVY_MODULES, prewarm
+if {eager!r}:
+    prewarm().join()
+print(json.dumps({{
+    "streamlit_ms": round((base - start) * 1000, 1),
+    "app_ms": round((app - base) * 1000, 1),
+    "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    "heavy_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+}}))
+"""
+
+
+def bench_startup(repeat):
+    """Vergleicht den Import bis zur Startseite mit und ohne sofortiges Laden der schweren Bibliotheken."""
+    results = []
+    for eager in (False, True):
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT.format(modules=APP_MODULES, eager=eager)],
+                check=True, capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            result["mode"] = "sofort" if eager else "später"
+            results.append(result)
+
+    print(f"{'Modus':>7} {'streamlit ms':>13} {'Module ms':>10} {'gesamt ms':>10}   geladen")
+    for r in results:
+        print(f"{r['mode']:>7} {r['streamlit_ms']:>13} {r['app_ms']:>10} {r['total_ms']:>10}   "
+              f"{', '.join(r['heavy_loaded']) or '-'}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Temporäre Datei vs. In-Memory-Einlesen")
+    ingest.add_argument("--sizes", type=int, nargs="+", default=[1, 50, 200], help="Dateigrößen in MB")
+    ingest.add_argument("--repeat", type=int, default=1)
+
+    chunked = sub.add_parser("chunked", help="Einmaliges vs. stückweises Einlesen mit Aggregation je Mitglied")
+    chunked.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="Dateigrößen in MB")
+    chunked.add_argument("--members", type=int, default=5000, help="Verschiedene Mitglieder in der Datei")
+    chunked.add_argument("--repeat", type=int, default=1)
+
+    parallel = sub.add_parser("parallel", help="Serielles vs. paralleles Einlesen mehrerer Berichte")
+    parallel.add_argument("--files", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Anzahl Dateien")
+    parallel.add_argument("--size-mb", type=int, default=5, help="Größe je Datei in MB")
+    parallel.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+
+    suite = sub.add_parser("suite", help="Alle Stufen auf synthetischen Berichten, Vergleich mit Baseline")
+    suite.add_argument("--members", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+                       help="Anzahl Mitglieder je Bericht")
+    suite.add_argument("--formats", nargs="+", choices=list(SCHEMAS), default=list(SCHEMAS))
+    suite.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    suite.add_argument("--repeat", type=int, default=3, help="Läufe je Messung (Median)")
+    suite.add_argument("--baseline", default=DEFAULT_BASELINE, help="Pfad der Baseline-Datei (JSON)")
+    suite.add_argument("--save-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="Erlaubte Verlangsamung (0.25 = 25%%)")
+    suite.add_argument("--fail-on-regression", action="store_true", help="Exit-Code 1 bei Regressionen")
+
+    startup = sub.add_parser("startup", help="Importzeit bis zur Startseite, verzögert vs. sofort geladen")
+    startup.add_argument("--repeat", type=int, default=3)
+
+    worker = sub.add_parser("_ingest-worker")
+    worker.add_argument("path")
+    worker.add_argument("mode", choices=["tempfile", "memory", "oneshot", "chunked"])
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        bench_ingest(args.sizes, args.repeat)
+    elif args.command == "chunked":
+        verify_chunked()
+        bench_ingest(args.sizes, args.repeat, modes=("oneshot", "chunked"), members=args.members)
+    elif args.command == "parallel":
+        bench_parallel(args.files, args.size_mb, args.workers)
+    elif args.command == "suite":
+        return run_suite(args)
+    elif args.command == "startup":
+        bench_startup(args.repeat)
+    elif args.command == "_ingest-worker":
+        _ingest_worker(args.path, args.mode)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
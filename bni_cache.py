@@ -0,0 +1,189 @@
+"""Festplatten-Cache für eingelesene BNI-Berichte.
+
+Der Schlüssel ist ein SHA-256 über den Dateiinhalt, gespeichert wird der bereits
+aufbereitete DataFrame als Parquet-Datei plus eine kleine JSON-Datei mit dem
+erkannten Format. Überschreitet der Cache seine Maximalgröße, werden die am
+längsten nicht genutzten Einträge gelöscht (LRU über die Änderungszeit).
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from bni_loader import SniffResult
+
+# Wird erhöht, wenn sich die Aufbereitung der Daten ändert
+CACHE_VERSION = 7
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "BNI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bni-dashboard")
+)
+DEFAULT_MAX_MB = int(os.environ.get("BNI_CACHE_MAX_MB", "512"))
+
+
+def content_key(data, variant=""):
+    """Cache-Schlüssel aus dem Dateiinhalt und der Art der Aufbereitung."""
+    digest = hashlib.sha256(memoryview(data))
+    digest.update(f"v{CACHE_VERSION}:{variant}".encode())
+    return digest.hexdigest()
+
+
+class ParsedDataCache:
+    """Größenbegrenzter LRU-Cache für aufbereitete DataFrames auf der Festplatte."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".parquet", base + ".json"
+
+    def get(self, key):
+        """Liefert (df, file_format, sniff) oder None."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            df = pd.read_parquet(data_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Zugriffszeit für die LRU-Reihenfolge aktualisieren
+        now = time.time()
+        for path in (data_path, meta_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+        sniff = SniffResult(**meta["sniff"]) if meta.get("sniff") else None
+        with self._lock:
+            self.hits += 1
+        return df, meta["file_format"], sniff
+
+    def put(self, key, df, file_format, sniff=None):
+        """Speichert einen Eintrag; nicht als Parquet speicherbare Daten werden übersprungen."""
+        data_path, meta_path = self._paths(key)
+        meta = {
+            "file_format": file_format,
+            "sniff": dataclasses.asdict(sniff) if sniff is not None else None,
+        }
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Erst vollständig schreiben, dann atomar umbenennen
+            df.to_parquet(data_path + tmp_suffix, index=True)
+            with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(data_path + tmp_suffix, data_path)
+            os.replace(meta_path + tmp_suffix, meta_path)
+        except Exception:
+            for path in (data_path + tmp_suffix, meta_path + tmp_suffix):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            return False
+
+        self._evict()
+        return True
+
+    def load(self, data, filename, loader, variant=""):
+        """Liefert (df, file_format, sniff, cache_hit); ruft ``loader`` nur bei einem Fehlversuch auf.
+
+        ``variant`` unterscheidet verschiedene Aufbereitungen derselben Datei.
+        """
+        key = content_key(data, variant)
+        cached = self.get(key)
+        if cached is not None:
+            return (*cached, True)
+
+        df, file_format, sniff = loader(data, filename)
+        self.put(key, df, file_format, sniff)
+        return df, file_format, sniff, False
+
+    def load_many(self, files, loader, variant="", executor=None):
+        """Lädt mehrere Dateien; nicht gecachte werden über ``executor`` parallel eingelesen.
+
+        ``files`` ist eine Liste von (filename, data), ``loader`` muss für einen
+        Prozess-Pool auf Modulebene definiert sein. Liefert eine Liste von
+        (df, file_format, sniff, cache_hit) in der Reihenfolge der Eingabe.
+        """
+        results = [None] * len(files)
+        pending = []
+        for i, (filename, data) in enumerate(files):
+            key = content_key(data, variant)
+            cached = self.get(key)
+            if cached is not None:
+                results[i] = (*cached, True)
+            else:
+                pending.append((i, key))
+
+        # Eine Datei pro Worker; bei nur einer Datei lohnt sich der Pool nicht
+        futures = {}
+        if executor is not None and len(pending) > 1:
+            futures = {i: executor.submit(loader, files[i][1], files[i][0]) for i, _ in pending}
+
+        for i, key in pending:
+            filename, data = files[i]
+            try:
+                df, file_format, sniff = futures[i].result() if futures else loader(data, filename)
+            except Exception as e:
+                raise ValueError(f"{filename}: {e}") from e
+            self.put(key, df, file_format, sniff)
+            results[i] = (df, file_format, sniff, False)
+        return results
+
+    def _entries(self):
+        """Alle Cache-Dateien mit Größe und letzter Nutzung, gruppiert nach Schlüssel."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext not in (".parquet", ".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            size, used = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Löscht die am längsten nicht genutzten Einträge, bis die Maximalgröße eingehalten ist."""
+        entries = self._entries()
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        """Zähler und aktuelle Größe des Caches."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_mb": round(sum(size for size, _ in entries.values()) / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
@@ -0,0 +1,223 @@
+"""Aufbereitung und Rendering der Diagramme für die Dashboard-Tabs.
+
+Es gibt zwei Backends: serverseitig gerenderte PNGs (matplotlib/seaborn) und
+Vega-Lite-Spezifikationen, die der Browser zeichnet. Die Spezifikationen
+enthalten keine Daten; Streamlit überträgt den DataFrame separat, und Hover,
+Tooltips und Größenänderungen kommen ohne Python-Rerun aus.
+
+matplotlib und seaborn werden erst beim ersten gerenderten Diagramm importiert
+(siehe ``bni_imports``), damit die Startseite nicht auf sie wartet.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from bni_imports import loaded, timed_import
+
+
+def _pyplot():
+    """matplotlib.pyplot mit Agg-Backend, beim ersten Aufruf importiert."""
+    return timed_import("matplotlib.pyplot")
+
+
+def _seaborn():
+    return timed_import("seaborn")
+
+
+def long_format(df, id_column, value_columns, var_name, value_name, labels=None, id_name=None):
+    """Wandelt Kennzahl-Spalten mit einer einzigen melt-Operation ins Langformat um.
+
+    ``labels`` benennt die Kennzahl-Spalten für die Anzeige um, ``id_name`` die
+    Spalte mit den Mitgliedernamen. Fehlende Spalten werden übersprungen; die
+    Zeilen sind nach Kennzahl und darin nach Mitglied geordnet.
+    """
+    value_columns = [col for col in value_columns if col in df.columns]
+    renames = dict(labels or {})
+    if id_name is not None:
+        renames[id_column] = id_name
+    frame = df[[id_column] + value_columns].rename(columns=renames)
+    return frame.melt(id_vars=[id_name or id_column], var_name=var_name, value_name=value_name)
+
+
+def without_categories(data, columns=None):
+    """Kategorische Spalten (alle oder ``columns``) als object.
+
+    Eine kategorische Spalte trägt alle Kategorien des ganzen Berichts mit, auch
+    wenn ``data`` nur wenige Zeilen enthält; beim Hashen, Zeichnen und Übertragen
+    an den Browser zählen nur die Werte der übergebenen Zeilen.
+    """
+    columns = data.columns if columns is None else [col for col in columns if col is not None]
+    return data.astype({col: object for col in columns if isinstance(data[col].dtype, pd.CategoricalDtype)})
+
+
+def chart_key(kind, data, **params):
+    """Cache-Schlüssel aus Diagrammtyp, Parametern und Inhalt der Daten.
+
+    Die Reihenfolge der Zeilen fließt in den Hash ein, damit ist auch die
+    gewählte Sortierung und Anzahl der Mitglieder Teil des Schlüssels.
+    """
+    digest = hashlib.sha1(kind.encode())
+    digest.update(repr(sorted(params.items())).encode())
+    digest.update(repr(list(data.columns)).encode())
+    # Kategorische Spalten würden alle Kategorien des ganzen Berichts mithashen
+    data = without_categories(data)
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def metric_group_data(df_display, group, var_name, id_column='Mitglied'):
+    """Diagrammdaten einer Kennzahlgruppe: (data, y, hue) für ``bar_chart_figure``, None ohne Spalten.
+
+    Eine einzelne Kennzahl wird direkt gezeigt, mehrere im Langformat mit der
+    Kennzahl als Farbe.
+    """
+    columns = [col for col in group.columns if col in df_display.columns]
+    if not columns:
+        return None
+    if len(columns) == 1:
+        return df_display[[id_column, columns[0]]], columns[0], None
+    data = long_format(df_display, id_column, columns, var_name=var_name, value_name='Anzahl', labels=group.columns)
+    return data, 'Anzahl', var_name
+
+
+def bar_chart_figure(data, x, y, hue=None, figsize=(10, 6), ylabel=None, title=None):
+    """Zeichnet ein Balkendiagramm in eine neue Figur; der Aufrufer muss sie schließen."""
+    # Kategorische Spalten würden alle Kategorien zeigen, nicht nur die übergebenen Zeilen
+    data = without_categories(data, (x, hue))
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        _seaborn().barplot(x=x, y=y, hue=hue, data=data, ax=ax)
+        ax.tick_params(axis='x', labelrotation=45)
+        if ylabel:
+            ax.set_ylabel(ylabel)
+        if title:
+            ax.set_title(title)
+        fig.tight_layout()
+    except Exception:
+        plt.close(fig)
+        raise
+    return fig
+
+
+def render_bar_chart(data, x, y, hue=None, figsize=(10, 6), ylabel=None):
+    """Zeichnet ein Balkendiagramm und liefert es als PNG; die Figur wird immer geschlossen."""
+    fig = bar_chart_figure(data, x, y, hue=hue, figsize=figsize, ylabel=ylabel)
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        _pyplot().close(fig)
+
+
+class FigureCache:
+    """LRU-Cache für gerenderte Diagramme, begrenzt auf ``max_mb`` MB PNG-Daten."""
+
+    def __init__(self, max_mb=64):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Liefert das PNG zu ``key`` und ruft ``render`` nur bei einem Fehlversuch auf."""
+        with self._lock:
+            png = self._images.get(key)
+            if png is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return png
+            self.misses += 1
+
+        png = render()
+
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = png
+                self.size += len(png)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+        return png
+
+    def stats(self):
+        """Zähler und aktuelle Größe des Caches."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._images),
+                "size_mb": round(self.size / (1024 * 1024), 2),
+            }
+
+
+def open_figure_count():
+    """Anzahl offener matplotlib-Figuren; alles über 0 deutet auf nicht geschlossene Figuren hin."""
+    if not loaded("matplotlib.pyplot"):
+        return 0
+    return len(_pyplot().get_fignums())
+
+
+def render_line_chart(data, x, figsize=(12, 6), ylabel=None):
+    """Zeichnet einen Verlauf (eine Linie je Spalte) und liefert ihn als PNG."""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        data.set_index(x).plot(ax=ax, marker='o')
+        ax.tick_params(axis='x', labelrotation=45)
+        if ylabel:
+            ax.set_ylabel(ylabel)
+        ax.legend(loc='upper left', bbox_to_anchor=(1.0, 1.0))
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def _field(name):
+    """Spaltenname als Vega-Lite-Feld; Punkte und Klammern würden sonst als Pfad gelesen."""
+    return str(name).replace('.', '\\.').replace('[', '\\[').replace(']', '\\]')
+
+
+def bar_chart_spec(x, y, hue=None, ylabel=None, height=400):
+    """Vega-Lite-Spezifikation eines (gruppierten) Balkendiagramms in der Reihenfolge der Zeilen."""
+    encoding = {
+        "x": {"field": _field(x), "type": "nominal", "sort": None, "title": x, "axis": {"labelAngle": -45}},
+        "y": {"field": _field(y), "type": "quantitative", "title": ylabel or y},
+        "tooltip": [{"field": _field(x), "title": x}, {"field": _field(y), "title": ylabel or y}],
+    }
+    if hue is not None:
+        encoding["color"] = {"field": _field(hue), "type": "nominal", "title": hue}
+        encoding["xOffset"] = {"field": _field(hue)}
+        encoding["tooltip"].insert(1, {"field": _field(hue), "title": hue})
+    return {"mark": {"type": "bar"}, "encoding": encoding, "height": height}
+
+
+def line_chart_spec(x, series, ylabel=None, height=400):
+    """Vega-Lite-Spezifikation eines Verlaufs mit einer Linie je Spalte in ``series``.
+
+    Die Daten bleiben im Breitformat, das Umformen übernimmt ein fold im Browser.
+    """
+    return {
+        "transform": [{"fold": [_field(col) for col in series], "as": ["Mitglied", "Wert"]}],
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": _field(x), "type": "temporal", "title": None},
+            "y": {"field": "Wert", "type": "quantitative", "title": ylabel},
+            "color": {"field": "Mitglied", "type": "nominal"},
+            "tooltip": [
+                {"field": _field(x), "type": "temporal", "title": "Periode"},
+                {"field": "Mitglied", "type": "nominal"},
+                {"field": "Wert", "type": "quantitative", "title": ylabel or "Wert"},
+            ],
+        },
+        "height": height,
+    }
@@ -0,0 +1,38 @@
+"""Export aufbereiteter Berichte als CSV, Excel oder Parquet.
+
+Die Datei wird erst auf Anforderung erzeugt und direkt in einen Bytes-Puffer
+geschrieben, ohne Zwischenstring und ohne Base64-Kodierung. Ausgeliefert wird
+sie über ``st.download_button``, sodass die Seite selbst nicht mit der
+Datengröße wächst.
+"""
+import io
+
+from bni_imports import timed_import
+
+# Anzeigename -> (Dateiendung, MIME-Typ)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_bytes(df, fmt):
+    """Schreibt ``df`` im Format ``fmt`` (Schlüssel aus EXPORT_FORMATS) und liefert die Bytes."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unbekanntes Exportformat: {fmt}")
+
+    buffer = io.BytesIO()
+    if fmt == "CSV":
+        df.to_csv(buffer, index=False, encoding="utf-8")
+    elif fmt == "Excel":
+        timed_import("openpyxl")
+        df.to_excel(buffer, index=False, engine="openpyxl")
+    else:
+        df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def export_filename(fmt, basename="bni_data"):
+    """Dateiname für den Download im Format ``fmt``."""
+    return f"{basename}.{EXPORT_FORMATS[fmt][0]}"
@@ -0,0 +1,137 @@
+"""Verlauf mehrerer BNI-Berichte in einer lokalen SQLite-Datenbank.
+
+Jeder Bericht wird einmal mit seinem Berichtsdatum (Periode) gespeichert; die
+Kennzahlen liegen im Langformat (Periode, Mitglied, Kennzahl, Wert) mit Indizes
+auf Mitglied+Periode und Kennzahl+Periode. Trendabfragen über viele Wochen sind
+damit indizierte Lesezugriffe statt erneutem Einlesen aller Dateien.
+"""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from bni_schema import NUMERIC_COLUMNS
+
+DEFAULT_HISTORY_DB = os.environ.get(
+    "BNI_HISTORY_DB",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "bni-dashboard", "history.sqlite"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY,
+    period TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    filename TEXT,
+    loaded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_period ON reports(period, file_format);
+
+CREATE TABLE IF NOT EXISTS member_metrics (
+    report_id INTEGER NOT NULL REFERENCES reports(report_id) ON DELETE CASCADE,
+    period TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    member TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_member_period ON member_metrics(member, period);
+CREATE INDEX IF NOT EXISTS idx_metrics_metric_period ON member_metrics(file_format, metric, period);
+CREATE INDEX IF NOT EXISTS idx_metrics_report ON member_metrics(report_id);
+"""
+
+
+def _period_key(period):
+    """Periode als ISO-Datum; date, datetime und pd.Timestamp ergeben denselben Schlüssel."""
+    return pd.Timestamp(period).date().isoformat()
+
+
+def content_hash(data):
+    """SHA-256 der Dateibytes; unabhängig von der Cache-Version, damit dieselbe Datei auch
+    nach Änderungen am Einlesen als "unverändert" erkannt wird."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class HistoryStore:
+    """Inkrementell befüllbarer Verlauf aller gespeicherten Berichte."""
+
+    def __init__(self, path=DEFAULT_HISTORY_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def append(self, df, file_format, period, content_hash, filename=None):
+        """Speichert einen Bericht für ``period``.
+
+        Liefert "unverändert", wenn genau diese Datei schon gespeichert ist,
+        "ersetzt", wenn für die Periode ein anderer Bericht vorlag, sonst "neu".
+        """
+        period = _period_key(period)
+        metrics = [col for col in NUMERIC_COLUMNS[file_format] if col in df.columns]
+        long_df = df[metrics].assign(member=df['Mitglied'].astype(str).values)
+        long_df = long_df.melt(id_vars=['member'], var_name='metric', value_name='value').dropna(subset=['value'])
+
+        with closing(self._connect()) as conn, conn:
+            if conn.execute("SELECT 1 FROM reports WHERE content_hash = ?", (content_hash,)).fetchone():
+                return "unverändert"
+
+            deleted = conn.execute(
+                "DELETE FROM reports WHERE period = ? AND file_format = ?", (period, file_format)
+            ).rowcount
+            report_id = conn.execute(
+                "INSERT INTO reports (period, file_format, content_hash, filename) VALUES (?, ?, ?, ?)",
+                (period, file_format, content_hash, filename),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO member_metrics (report_id, period, file_format, member, metric, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (report_id, period, file_format, member, metric, float(value))
+                    for member, metric, value in long_df.itertuples(index=False, name=None)
+                ),
+            )
+        return "ersetzt" if deleted else "neu"
+
+    def reports(self):
+        """Alle gespeicherten Berichte, nach Periode sortiert."""
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                "SELECT period, file_format, filename, loaded_at FROM reports ORDER BY period", conn
+            )
+
+    def members(self, file_format):
+        """Alle Mitglieder, die im Verlauf für ``file_format`` vorkommen."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT member FROM member_metrics WHERE file_format = ? ORDER BY member",
+                (file_format,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def trend(self, file_format, metric, members=None, since=None):
+        """Verlauf einer Kennzahl als Tabelle Periode × Mitglied."""
+        query = "SELECT period, member, value FROM member_metrics WHERE file_format = ? AND metric = ?"
+        params = [file_format, metric]
+        if since is not None:
+            query += " AND period >= ?"
+            params.append(_period_key(since))
+        if members:
+            query += f" AND member IN ({', '.join('?' * len(members))})"
+            params.extend(members)
+
+        with closing(self._connect()) as conn:
+            long_df = pd.read_sql_query(query + " ORDER BY period", conn, params=params)
+        if long_df.empty:
+            return pd.DataFrame()
+        return long_df.pivot_table(index='period', columns='member', values='value', aggfunc='sum')
@@ -0,0 +1,87 @@
+"""Verzögertes Laden schwerer Bibliotheken und Messung der Importzeiten.
+
+Die Startseite ohne Daten braucht weder matplotlib/seaborn noch die
+Excel-Engines. Diese Module werden daher erst beim ersten Diagramm bzw. der
+ersten Excel-Datei importiert; nach dem ersten Laden eines Berichts lädt ein
+Hintergrund-Thread sie vor, damit das erste Diagramm nicht auf den Import
+wartet. Jeder Import über ``timed_import`` wird mit Dauer und Auslöser erfasst.
+"""
+import importlib
+import sys
+import threading
+import time
+
+import pandas as pd
+
+# Module, die beim Start nicht geladen und nach dem ersten Bericht vorgeladen werden
+HEAVY_MODULES = ("matplotlib.pyplot", "seaborn", "openpyxl", "xlrd")
+
+_times = {}
+_lock = threading.Lock()
+_prewarm_thread = None
+
+
+def _use_agg():
+    """pyplot darf nur mit dem Agg-Backend geladen werden, auch im Hintergrund-Thread."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+# Vorbereitung, die vor dem Import eines Moduls laufen muss
+_BEFORE_IMPORT = {"matplotlib.pyplot": _use_agg, "seaborn": _use_agg}
+
+
+def timed_import(name, trigger="Anfrage"):
+    """Importiert ``name`` und erfasst beim ersten Mal Dauer und Auslöser."""
+    # import_module wartet, falls ein anderer Thread das Modul gerade lädt; ein
+    # Blick in sys.modules allein könnte ein halb initialisiertes Modul liefern
+    if name in sys.modules:
+        return importlib.import_module(name)
+    before = _BEFORE_IMPORT.get(name)
+    start = time.perf_counter()
+    if before is not None:
+        before()
+    module = importlib.import_module(name)
+    ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        # Bei gleichzeitigem Import zählt die erste Messung
+        _times.setdefault(name, {"ms": ms, "trigger": trigger})
+    return module
+
+
+def loaded(name):
+    """True, wenn ``name`` bereits importiert ist."""
+    return name in sys.modules
+
+
+def prewarm(modules=HEAVY_MODULES, on_done=None):
+    """Lädt ``modules`` einmalig in einem Hintergrund-Thread; liefert den Thread.
+
+    Fehlende optionale Module (z.B. xlrd) werden übersprungen. ``on_done`` wird
+    nach dem letzten Import mit der Gesamtdauer in ms aufgerufen.
+    """
+    global _prewarm_thread
+    with _lock:
+        if _prewarm_thread is not None:
+            return _prewarm_thread
+
+        def run():
+            start = time.perf_counter()
+            for name in modules:
+                try:
+                    timed_import(name, trigger="Vorladen")
+                except ImportError:
+                    pass
+            if on_done is not None:
+                on_done((time.perf_counter() - start) * 1000)
+
+        _prewarm_thread = threading.Thread(target=run, name="bni-prewarm", daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
+
+
+def import_times():
+    """Erfasste Importe als Tabelle mit Dauer und Auslöser (Anfrage oder Vorladen)."""
+    with _lock:
+        rows = [(name, round(t["ms"], 1), t["trigger"]) for name, t in _times.items()]
+    return pd.DataFrame(rows, columns=["Modul", "Dauer (ms)", "Ausgelöst durch"]).set_index("Modul")
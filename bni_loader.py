@@ -0,0 +1,502 @@
+"""Einlesen von BNI-Berichten (CSV oder Excel) ohne Streamlit-Abhängigkeit."""
+import csv
+import datetime
+import io
+import os
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from bni_imports import timed_import
+from bni_schema import MIN_CONFIDENCE, NAME_COLUMNS, NUMERIC_COLUMNS, SCHEMAS, match_format, to_canonical
+
+# Anzahl Bytes, die für die Formaterkennung gelesen werden
+SNIFF_BYTES = 64 * 1024
+
+# Magic Bytes der Excel-Formate
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+CSV_SEPARATORS = [',', ';', '\t']
+
+# Zeilen je Stück beim stückweisen Einlesen großer Exporte
+CHUNK_ROWS = 50000
+
+# Abweichende Aggregation je Mitglied; alle anderen Kennzahlen werden summiert
+MEMBER_AGGREGATION = {'Platzierung': 'min'}
+
+# Zahlen im deutschen Format ("1.234,56", "12,5") bzw. mit englischem Tausenderkomma ("1,234.56")
+GERMAN_NUMBER = r'-?\d{1,3}(?:\.\d{3})+(?:,\d+)?|-?\d+,\d+'
+# Deutsche Zahlen, die auch in Dateien mit Dezimalpunkt nicht anders zu lesen sind:
+# mehrere Tausenderpunkte, Tausenderpunkt mit Dezimalkomma oder ein kurzes Dezimalkomma.
+# "1.250" allein bleibt dort 1,25.
+GERMAN_UNAMBIGUOUS = r'-?\d{1,3}(?:\.\d{3}){2,}(?:,\d+)?|-?\d{1,3}(?:\.\d{3})+,\d+|-?\d+,\d{1,2}'
+ENGLISH_THOUSANDS = r'-?\d{1,3}(?:,\d{3})+\.\d+'
+
+
+@dataclass
+class SniffResult:
+    """Ergebnis der Formaterkennung inklusive Begründung und Zeitmessung."""
+    kind: str = "csv"
+    engine: str = None
+    encoding: str = None
+    separator: str = None
+    decimal: str = "."
+    reasons: list = field(default_factory=list)
+    sniff_ms: float = 0.0
+    parse_ms: float = 0.0
+    # Kennzahl-Spalte -> Anzahl Zellen, die sich nicht als Zahl lesen ließen
+    coerced_nan: dict = field(default_factory=dict)
+    # Dauer der Aufbereitungsschritte nach dem Einlesen in ms (detect, coerce, aggregate, canonical)
+    stage_ms: dict = field(default_factory=dict)
+    # Aus der Kopfzeile erkanntes Format, Anteil seines Fingerabdrucks und fehlende Spalten
+    file_format: str = None
+    confidence: float = None
+    missing_columns: list = field(default_factory=list)
+
+    def describe(self):
+        """Kurzbeschreibung für die Anzeige im Dashboard."""
+        if self.kind == "excel":
+            return f"Excel ({self.engine})"
+        sep = "\\t" if self.separator == "\t" else self.separator
+        text = f"CSV mit Encoding {self.encoding} und Trennzeichen '{sep}'"
+        if self.decimal != ".":
+            text += f", Dezimalzeichen '{self.decimal}'"
+        return text
+
+
+@contextmanager
+def _stage(sniff, name):
+    """Addiert die Dauer des ``with``-Blocks unter ``name`` zu ``sniff.stage_ms``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if sniff is not None:
+            sniff.stage_ms[name] = sniff.stage_ms.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def _sniff_encoding(head, result):
+    """Wählt das Encoding anhand von BOM und Probe-Dekodierung."""
+    if head.startswith(b"\xef\xbb\xbf"):
+        result.reasons.append("UTF-8-BOM gefunden")
+        return "utf-8-sig"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        result.reasons.append("UTF-16-BOM gefunden")
+        return "utf-16"
+
+    # Ein am Ende abgeschnittenes Mehrbyte-Zeichen ist kein Fehler
+    try:
+        head.decode("utf-8")
+        result.reasons.append("Probe ist gültiges UTF-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(head) - 3 and e.reason == "unexpected end of data":
+            result.reasons.append("Probe ist gültiges UTF-8")
+            return "utf-8"
+
+    try:
+        head.decode("cp1252")
+        result.reasons.append("Kein gültiges UTF-8, Probe passt zu cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        result.reasons.append("Weder UTF-8 noch cp1252, verwende latin1")
+        return "latin1"
+
+
+def _sniff_separator(text, result):
+    """Wählt das Trennzeichen anhand der Kopfzeile."""
+    lines = text.splitlines()
+    header = lines[0] if lines else ""
+    counts = {sep: header.count(sep) for sep in CSV_SEPARATORS}
+    best = max(CSV_SEPARATORS, key=lambda sep: counts[sep])
+
+    if counts[best] == 0:
+        result.reasons.append("Kein Trennzeichen in der Kopfzeile, verwende ','")
+        return ','
+
+    # Bei Gleichstand entscheidet der csv.Sniffer über die ganze Probe
+    if list(counts.values()).count(counts[best]) > 1:
+        try:
+            best = csv.Sniffer().sniff(text, delimiters="".join(CSV_SEPARATORS)).delimiter
+            result.reasons.append(f"Trennzeichen per csv.Sniffer gewählt: {best!r}")
+            return best
+        except csv.Error:
+            pass
+
+    result.reasons.append(f"Trennzeichen in der Kopfzeile gezählt: {counts}")
+    return best
+
+
+def _sniff_decimal(text, separator, result):
+    """Erkennt Dezimalkommas in den Datenzeilen, damit der CSV-Parser sie direkt liest.
+
+    Tausenderpunkte werden nicht an den Parser gegeben, er läse sonst auch ein
+    Datum wie 08.01.2026 als Zahl; Werte wie "1.250" liest ``coerce_numeric``.
+    """
+    if separator == ',':
+        return '.'
+    # Ein Suchlauf je Muster über alle Datenzeilen statt einer Prüfung je Feld
+    body = text.partition('\n')[2]
+    sep = re.escape(separator)
+    field_pattern = rf'(?:^|{sep})[ \t"]*-?\d+{{}}\d+[ \t"]*(?={sep}|\r?$)'
+    comma = len(re.findall(field_pattern.format(','), body, flags=re.MULTILINE))
+    dot = len(re.findall(field_pattern.format(r'\.'), body, flags=re.MULTILINE))
+    if comma > dot:
+        result.reasons.append(f"Dezimalkomma in {comma} Werten der Probe gefunden")
+        return ','
+    if separator == ';':
+        # Semikolon-Exporte kommen aus deutschen Einstellungen: "1.250" hat dort einen
+        # Tausenderpunkt. Nur Punkte ohne genau drei Ziffern dahinter sind Dezimalpunkte.
+        english = len(re.findall(rf'(?:^|{sep})[ \t"]*-?\d+\.(?:\d{{1,2}}|\d{{4,}})[ \t"]*(?={sep}|\r?$)',
+                                 body, flags=re.MULTILINE))
+        if not english:
+            result.reasons.append("Semikolon als Trennzeichen, keine eindeutigen Dezimalpunkte: "
+                                  "deutsches Zahlenformat")
+            return ','
+    return '.'
+
+
+def sniff_format(head, filename=""):
+    """Erkennt Excel/CSV, Encoding und Trennzeichen aus den ersten Bytes der Datei."""
+    start = time.perf_counter()
+    result = SniffResult()
+    head = bytes(head[:SNIFF_BYTES])
+    is_excel_name = filename.lower().endswith(('.xls', '.xlsx'))
+
+    if head.startswith(XLSX_MAGIC):
+        result.kind, result.engine = "excel", "openpyxl"
+        result.reasons.append("ZIP-Signatur gefunden (xlsx)")
+    elif head.startswith(XLS_MAGIC):
+        result.kind, result.engine = "excel", "xlrd"
+        result.reasons.append("OLE2-Signatur gefunden (xls)")
+    else:
+        if is_excel_name:
+            result.reasons.append("Excel-Dateiendung, aber keine Excel-Signatur: lese als CSV")
+        result.encoding = _sniff_encoding(head, result)
+        text = head.decode(result.encoding, errors="ignore")
+        result.separator = _sniff_separator(text, result)
+        result.decimal = _sniff_decimal(text, result.separator, result)
+
+    result.sniff_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+def read_header(source, sniff):
+    """Liest nur die Kopfzeile mit den erkannten Parametern und liefert die Spaltennamen."""
+    try:
+        columns = _read_columns(source, sniff)
+    except pd.errors.EmptyDataError:
+        raise ValueError("Die Datei enthält keine Daten.") from None
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return [str(col).strip() for col in columns]
+
+
+def _read_columns(source, sniff):
+    if sniff.kind == "excel":
+        timed_import(sniff.engine)
+        columns = pd.read_excel(source, engine=sniff.engine, nrows=0).columns
+    else:
+        try:
+            columns = pd.read_csv(source, encoding=sniff.encoding, sep=sniff.separator, nrows=0).columns
+        except UnicodeDecodeError:
+            # Die Kopfzeile ist dann auch mit cp1252 lesbar; das Einlesen wechselt selbst
+            if hasattr(source, "seek"):
+                source.seek(0)
+            columns = pd.read_csv(source, encoding="cp1252", sep=sniff.separator, nrows=0).columns
+    return columns
+
+
+def detect_format(source, sniff):
+    """Erkennt das Format aus der Kopfzeile, bevor die Datei ganz gelesen wird.
+
+    Passt die Kopfzeile zu keinem registrierten Format, bricht das Einlesen
+    hier mit einem ValueError ab, statt später in einem Tab zu scheitern.
+    """
+    with _stage(sniff, "detect"):
+        match = match_format(read_header(source, sniff))
+    if match.file_format is None:
+        if match.confidence < MIN_CONFIDENCE:
+            raise ValueError(
+                f"Unbekanntes Dateiformat: Die Spalten passen zu keinem bekannten Format "
+                f"(Übereinstimmung: {match.describe()})."
+            )
+        raise ValueError(
+            f"Unvollständiger Bericht: Es fehlen die Pflichtspalten {', '.join(match.missing_required)} "
+            f"(Übereinstimmung: {match.describe()})."
+        )
+    sniff.file_format = match.file_format
+    sniff.confidence = match.confidence
+    sniff.missing_columns = list(match.missing_columns)
+    sniff.reasons.append(f"Format aus der Kopfzeile erkannt: {match.describe()}")
+    if match.missing_columns:
+        sniff.reasons.append(f"Fehlende Spalten: {', '.join(match.missing_columns)}")
+    return match.file_format
+
+
+def parse_file(source, sniff):
+    """Liest die Datei genau einmal mit den erkannten Parametern."""
+    start = time.perf_counter()
+    if sniff.kind == "excel":
+        # Die Excel-Engine wird erst hier geladen; timed_import erfasst die Importzeit
+        timed_import(sniff.engine)
+        df = pd.read_excel(source, engine=sniff.engine)
+    else:
+        try:
+            df = pd.read_csv(source, encoding=sniff.encoding, sep=sniff.separator, decimal=sniff.decimal)
+        except UnicodeDecodeError:
+            # Die Probe war UTF-8, spätere Zeilen aber nicht
+            if sniff.encoding not in ("utf-8", "utf-8-sig"):
+                raise
+            sniff.reasons.append("UTF-8-Fehler nach der Probe, lese erneut mit cp1252")
+            sniff.encoding = "cp1252"
+            if hasattr(source, "seek"):
+                source.seek(0)
+            df = pd.read_csv(source, encoding=sniff.encoding, sep=sniff.separator, decimal=sniff.decimal)
+    sniff.parse_ms = (time.perf_counter() - start) * 1000
+    return df
+
+
+def read_upload(data, filename=""):
+    """Liest einen Upload direkt aus dem Speicher, ohne temporäre Datei.
+
+    Die Formaterkennung arbeitet auf einer memoryview der ersten Bytes, der
+    Parser auf einem BytesIO, das den Puffer von ``data`` mitbenutzt.
+    """
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    sniff = sniff_format(memoryview(data)[:SNIFF_BYTES], filename)
+    source = io.BytesIO(data)
+    detect_format(source, sniff)
+    df = parse_file(source, sniff)
+    return df, sniff
+
+
+def detect_file_format(df):
+    """Erkennt das Format eines bereits gelesenen DataFrames anhand seiner Spalten.
+
+    Unbekannte Spalten führen zu einem ValueError statt zum Standardformat.
+    """
+    match = match_format(df.columns)
+    if match.file_format is None:
+        raise ValueError(f"Unbekanntes Dateiformat (Übereinstimmung: {match.describe()}).")
+    return match.file_format
+
+
+def parse_numbers(values, decimal="."):
+    """Liest Texte wie "1.234,56 €", "12,5" oder "1,234.56" als Zahlen; Unlesbares wird NaN.
+
+    Das deutsche Format mit Tausenderpunkt gilt nur, wenn die Datei ein
+    Dezimalkomma hat (``decimal=","``), der Wert ein €-Zeichen trägt oder er
+    eindeutig ist. Sonst bliebe "1.250" je nach den übrigen Zellen der Spalte
+    einmal 1,25 und einmal 1250.
+    """
+    raw = values.astype('string')
+    text = raw.str.replace(r'[€\s\u00a0]', '', regex=True)
+    german = text.str.fullmatch(GERMAN_NUMBER).fillna(False)
+    if decimal != ",":
+        euro = raw.str.contains('€', regex=False).fillna(False)
+        german &= euro | text.str.fullmatch(GERMAN_UNAMBIGUOUS).fillna(False)
+    english = text.str.fullmatch(ENGLISH_THOUSANDS).fillna(False)
+    text = text.mask(german, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    text = text.mask(english, text.str.replace(',', '', regex=False))
+    return pd.to_numeric(text, errors='coerce')
+
+
+def coerce_numeric(df, file_format, decimal="."):
+    """Konvertiert die Kennzahl-Spalten des Formats in einem Durchgang zu numerischen Werten.
+
+    Spalten, die der Parser bereits numerisch gelesen hat, bleiben unverändert.
+    Alle übrigen werden zu einer Reihe zusammengelegt und gemeinsam konvertiert;
+    ``decimal`` ist das Dezimalzeichen der Datei (siehe ``parse_numbers``).
+    Liefert (df, coerced_nan) mit der Anzahl nicht lesbarer Zellen je Spalte.
+    """
+    columns = [col for col in NUMERIC_COLUMNS[file_format]
+               if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])]
+    if not columns:
+        return df, {}
+
+    # Spaltenweise hintereinander, damit sich das Ergebnis wieder aufteilen lässt
+    values = pd.Series(df[columns].to_numpy(dtype=object).ravel(order='F'))
+    numbers = parse_numbers(values, decimal)
+    filled = values.notna() & (values.astype('string').str.strip() != '').fillna(False)
+    failed = (filled & numbers.isna()).to_numpy().reshape(len(columns), len(df)).sum(axis=1)
+
+    df[columns] = numbers.to_numpy(dtype=float).reshape(len(columns), len(df)).T
+    return df, {col: int(n) for col, n in zip(columns, failed) if n}
+
+
+def aggregate_members(df, file_format):
+    """Fasst mehrere Zeilen je Mitglied zusammen, z.B. bei Exporten über mehrere Chapter.
+
+    Zählwerte werden summiert, die Platzierung behält den besten Wert, alle
+    anderen Spalten den ersten. Die Aggregation ist assoziativ und kann daher
+    auch stückweise auf Teilergebnisse angewendet werden.
+    """
+    keys = [col for col in SCHEMAS[file_format].name_columns if col in df.columns]
+    if not keys:
+        raise ValueError("Die Datei enthält keine Spalte mit Mitgliedernamen.")
+    spec = {
+        col: MEMBER_AGGREGATION.get(col, 'sum') if col in NUMERIC_COLUMNS[file_format] else 'first'
+        for col in df.columns if col not in keys
+    }
+    return df.groupby(keys, sort=False, dropna=False).agg(spec).reset_index()
+
+
+def prepare_data(df, aggregate=False, sniff=None):
+    """Bereinigt die Spalten, konvertiert die Kennzahlen und bildet auf das einheitliche Schema ab.
+
+    Ist ``sniff`` angegeben, werden dort die nicht lesbaren Zellen je Spalte
+    und die Dauer der einzelnen Schritte vermerkt.
+    """
+    # Bereinige die Spaltennamen
+    df.columns = df.columns.str.strip()
+
+    # Das Format steht meist schon aus der Kopfzeile fest
+    if sniff is not None and sniff.file_format is not None:
+        file_format = sniff.file_format
+    else:
+        with _stage(sniff, "detect"):
+            file_format = detect_file_format(df)
+
+    with _stage(sniff, "coerce"):
+        df, coerced_nan = coerce_numeric(df, file_format, sniff.decimal if sniff is not None else ".")
+    if sniff is not None:
+        sniff.coerced_nan = coerced_nan
+    if aggregate:
+        with _stage(sniff, "aggregate"):
+            df = aggregate_members(df, file_format)
+
+    # Bringe beide Formate in das einheitliche Schema
+    with _stage(sniff, "canonical"):
+        df = to_canonical(df, file_format)
+
+    return df, file_format
+
+
+def load_report(data, filename="", aggregate=False):
+    """Liest einen Bericht ein und bereitet ihn auf; liefert (df, file_format, sniff)."""
+    df, sniff = read_upload(data, filename)
+    if df.empty:
+        raise ValueError("Die Datei enthält keine Daten.")
+    df, file_format = prepare_data(df, aggregate=aggregate, sniff=sniff)
+    return df, file_format, sniff
+
+
+def _aggregate_chunks(source, sniff, chunk_rows):
+    """Liest die CSV stückweise und aggregiert jedes Stück sofort je Mitglied."""
+    totals = None
+    # Das Format steht aus der Kopfzeile fest; bei einem zweiten Durchlauf
+    # (cp1252) werden nur die Zeiten der Stücke neu gezählt
+    file_format = sniff.file_format
+    sniff.coerced_nan = {}
+    sniff.stage_ms = {name: ms for name, ms in sniff.stage_ms.items() if name == "detect"}
+    for chunk in pd.read_csv(source, encoding=sniff.encoding, sep=sniff.separator,
+                             decimal=sniff.decimal, chunksize=chunk_rows):
+        chunk.columns = chunk.columns.str.strip()
+        with _stage(sniff, "coerce"):
+            chunk, coerced_nan = coerce_numeric(chunk, file_format, sniff.decimal)
+        for col, n in coerced_nan.items():
+            sniff.coerced_nan[col] = sniff.coerced_nan.get(col, 0) + n
+        with _stage(sniff, "aggregate"):
+            part = aggregate_members(chunk, file_format)
+            if totals is None:
+                totals = part
+            else:
+                totals = aggregate_members(pd.concat([totals, part], ignore_index=True), file_format)
+    return totals, file_format
+
+
+def read_chunked(source, filename="", chunk_rows=CHUNK_ROWS):
+    """Liest große CSV-Exporte in Stücken von ``chunk_rows`` Zeilen, aggregiert je Mitglied.
+
+    ``source`` ist entweder der Dateiinhalt als Bytes oder ein Dateipfad. Der
+    Speicherbedarf hängt von der Stückgröße und der Zahl der Mitglieder ab,
+    nicht von der Dateigröße. Das Ergebnis entspricht
+    ``load_report(data, filename, aggregate=True)``. Excel-Dateien lassen sich
+    nicht streamen und werden in einem Stück gelesen.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        head = memoryview(data)[:SNIFF_BYTES]
+        open_source = lambda: io.BytesIO(data)
+    else:
+        with open(source, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+        open_source = lambda: source
+
+    sniff = sniff_format(head, filename)
+    detect_format(open_source(), sniff)
+    if sniff.kind == "excel":
+        df = parse_file(open_source(), sniff)
+        if df.empty:
+            raise ValueError("Die Datei enthält keine Daten.")
+        df, file_format = prepare_data(df, aggregate=True, sniff=sniff)
+        return df, file_format, sniff
+
+    start = time.perf_counter()
+    try:
+        totals, file_format = _aggregate_chunks(open_source(), sniff, chunk_rows)
+    except UnicodeDecodeError:
+        # Die Probe war UTF-8, spätere Zeilen aber nicht
+        if sniff.encoding not in ("utf-8", "utf-8-sig"):
+            raise
+        sniff.reasons.append("UTF-8-Fehler nach der Probe, lese erneut mit cp1252")
+        sniff.encoding = "cp1252"
+        totals, file_format = _aggregate_chunks(open_source(), sniff, chunk_rows)
+    sniff.reasons.append(f"Stückweise gelesen ({chunk_rows} Zeilen je Stück), je Mitglied aggregiert")
+    sniff.parse_ms = (time.perf_counter() - start) * 1000
+
+    if totals is None or totals.empty:
+        raise ValueError("Die Datei enthält keine Daten.")
+    with _stage(sniff, "canonical"):
+        totals = to_canonical(totals, file_format)
+    return totals, file_format, sniff
+
+
+def report_period(df, filename=""):
+    """Berichtsdatum aus der Spalte 'Datum' (Pagisto) oder dem Dateinamen, sonst None."""
+    if 'Datum' in df.columns:
+        dates = pd.to_datetime(df['Datum'], errors='coerce', dayfirst=True).dropna()
+        if not dates.empty:
+            return dates.max().date()
+
+    # Dateinamen wie "PALMS_2026-01-08.csv" oder "Bericht 08.01.2026.xlsx"
+    name = os.path.basename(filename)
+    match = re.search(r"(\d{4})-(\d{2})-(\d{2})", name)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", name)
+        if not match:
+            return None
+        day, month, year = match.groups()
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def merge_reports(reports):
+    """Führt mehrere aufbereitete Berichte zu einem DataFrame mit den Spalten Quelle und Periode zusammen.
+
+    ``reports`` ist eine Liste von (filename, df).
+    """
+    frames = []
+    for filename, df in reports:
+        period = report_period(df, filename)
+        frames.append(df.assign(
+            Quelle=filename,
+            Periode=pd.Timestamp(period) if period is not None else pd.NaT,
+        ))
+    merged = pd.concat(frames, ignore_index=True)
+
+    # Kategorien der einzelnen Berichte unterscheiden sich, nach concat neu bilden
+    for col in NAME_COLUMNS + ['Quelle']:
+        if col in merged.columns:
+            merged[col] = merged[col].astype('category')
+    return merged
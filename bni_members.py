@@ -0,0 +1,121 @@
+"""Einheitliche Mitglieder-IDs über Berichte und Formate hinweg.
+
+Namen werden normalisiert (Groß-/Kleinschreibung, Umlaute, Akzente, Satzzeichen,
+"Nachname, Vorname"), sodass "Jörg Müller", "joerg mueller" und "Müller, Jörg"
+dieselbe stabile ID erhalten. Die ID ist ein Hash des normalisierten Namens und
+damit in jedem Bericht und jeder Sitzung gleich. Berechnet wird nur je
+Kategorie der Namensspalte, nicht je Zeile.
+"""
+import bisect
+import difflib
+import hashlib
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def normalize_name(name):
+    """Vergleichsschlüssel eines Namens, z.B. "Müller, Jörg" -> "joerg mueller"."""
+    text = str(name).strip().casefold()
+    # "Nachname, Vorname" in "Vorname Nachname" drehen
+    if text.count(',') == 1:
+        last, first = text.split(',')
+        text = f"{first} {last}"
+    text = text.translate(UMLAUTS)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s-]", ' ', text)
+    return ' '.join(text.split())
+
+
+def stable_id(key):
+    """63-Bit-ID aus einem normalisierten Namen, gleich in jedem Prozess."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') >> 1
+
+
+def member_ids(names):
+    """IDs für eine kategorische Namensspalte; fehlende Namen erhalten -1."""
+    names = names.astype('category')
+    ids_by_code = np.array([stable_id(normalize_name(name)) for name in names.cat.categories], dtype=np.int64)
+    codes = names.cat.codes.to_numpy()
+    return pd.Series(np.where(codes >= 0, ids_by_code[codes], -1), index=names.index, dtype=np.int64)
+
+
+def _prefix_matches(keys, names, prefix, limit):
+    """Namen zu allen sortierten ``keys``, die mit ``prefix`` beginnen (höchstens ``limit``)."""
+    found = []
+    for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+        if len(found) >= limit or not keys[i].startswith(prefix):
+            break
+        if names[i] not in found:
+            found.append(names[i])
+    return found
+
+
+class MemberIndex:
+    """Mitglieder eines Berichts mit ID, Anzeigename und Schlüssel für Präfix- und Ähnlichkeitssuche."""
+
+    def __init__(self, df):
+        self.row_ids = df['MitgliedID'].to_numpy()
+        members = (
+            pd.DataFrame({'id': self.row_ids, 'name': df['Mitglied'].astype(str).to_numpy()})
+            .drop_duplicates('id')
+        )
+        members = members[members['id'] >= 0]
+        self._id_by_name = dict(zip(members['name'], members['id']))
+        self._name_by_id = dict(zip(members['id'], members['name']))
+        # Sortierte Schlüssel für die Präfixsuche per Bisektion, einmal für den
+        # ganzen Namen und einmal je weiterem Namensteil (Nachname)
+        keyed = sorted((normalize_name(name), name) for name in members['name'])
+        self._keys = [key for key, _ in keyed]
+        self._key_names = [name for _, name in keyed]
+        self._name_by_key = dict(keyed)
+        parts = sorted((part, name) for key, name in keyed for part in key.split()[1:])
+        self._parts = [part for part, _ in parts]
+        self._part_names = [name for _, name in parts]
+
+    def __len__(self):
+        return len(self._name_by_id)
+
+    def known(self, names):
+        """Anzeigenamen dieses Berichts zu ``names``, auch bei anderer Schreibweise; Unbekannte entfallen."""
+        result = []
+        for member_id in self.ids(names):
+            name = self._name_by_id.get(member_id)
+            if name is not None and name not in result:
+                result.append(name)
+        return result
+
+    def options(self):
+        """Ein Anzeigename je Mitglied in der Reihenfolge des Berichts."""
+        return list(self._name_by_id.values())
+
+    def ids(self, names):
+        """IDs zu Anzeigenamen; unbekannte Namen werden über ihren normalisierten Namen zugeordnet."""
+        return np.array(
+            [self._id_by_name.get(name, stable_id(normalize_name(name))) for name in names], dtype=np.int64
+        )
+
+    def mask(self, names):
+        """Bool-Maske der Zeilen, die zu ``names`` gehören, per Vergleich der Integer-IDs."""
+        return np.isin(self.row_ids, self.ids(names))
+
+    def lookup(self, query, limit=20):
+        """Anzeigenamen passend zu ``query``: erst Präfixe (auch des Nachnamens), dann ähnliche Schreibweisen."""
+        key = normalize_name(query)
+        if not key:
+            return []
+        found = _prefix_matches(self._keys, self._key_names, key, limit)
+        for name in _prefix_matches(self._parts, self._part_names, key, limit):
+            if len(found) < limit and name not in found:
+                found.append(name)
+        if len(found) < limit:
+            for close in difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.75):
+                name = self._name_by_key[close]
+                if len(found) < limit and name not in found:
+                    found.append(name)
+        return found
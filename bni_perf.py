@@ -0,0 +1,98 @@
+"""Opt-in-Messung der Laufzeiten einzelner Verarbeitungsschritte.
+
+Ein ``PerfRecorder`` sammelt die Ereignisse einer Sitzung (Kategorie, Abschnitt,
+Dauer, aktueller Arbeitsspeicher). Sie werden im Dashboard angezeigt und lassen
+sich als JSON Lines exportieren oder an die Datei in ``BNI_PERF_LOG`` anhängen,
+um mehrere Sitzungen gemeinsam auszuwerten.
+"""
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+DEFAULT_PERF_LOG = os.environ.get("BNI_PERF_LOG")
+
+
+def current_rss_mb():
+    """Aktueller Arbeitsspeicher (RSS) des Prozesses in MB; ohne /proc der Spitzenwert, ohne beides NaN."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # resource gibt es nur unter Unix; unter Windows bleibt der Wert leer
+        try:
+            import resource
+        except ImportError:
+            return float("nan")
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux liefert KB, macOS Bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PerfRecorder:
+    """Sammelt Messereignisse einer Sitzung; die ältesten fallen nach ``max_events`` heraus."""
+
+    def __init__(self, session_id=None, log_path=DEFAULT_PERF_LOG, max_events=2000):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def record(self, category, name, ms, **extra):
+        """Speichert ein Ereignis und hängt es an die Logdatei an, falls eine konfiguriert ist."""
+        event = {
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "session": self.session_id,
+            "category": category,
+            "name": name,
+            "ms": round(ms, 2),
+            "rss_mb": round(current_rss_mb(), 1),
+            **extra,
+        }
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self.events.append(event)
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+                except OSError:
+                    pass
+        return event
+
+    @contextmanager
+    def stage(self, category, name, **extra):
+        """Misst die Dauer des ``with``-Blocks als Ereignis."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, (time.perf_counter() - start) * 1000, **extra)
+
+    def summary(self):
+        """Anzahl, Mittelwert, Maximum und letzte Dauer je Kategorie und Abschnitt."""
+        with self._lock:
+            events = pd.DataFrame(list(self.events))
+        if events.empty:
+            return events
+        grouped = events.groupby(['category', 'name'], sort=False)['ms']
+        return pd.DataFrame({
+            'Anzahl': grouped.size(),
+            'Mittel (ms)': grouped.mean().round(1),
+            'Max (ms)': grouped.max().round(1),
+            'Zuletzt (ms)': grouped.last().round(1),
+        }).rename_axis(['Kategorie', 'Abschnitt'])
+
+    def to_jsonl(self):
+        """Alle Ereignisse als JSON Lines (eine Zeile je Ereignis)."""
+        with self._lock:
+            events = list(self.events)
+        return "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events)
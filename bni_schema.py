@@ -0,0 +1,261 @@
+"""Einheitliches Mitglieder-Kennzahlen-Schema für Pagisto- und PALMS-Berichte.
+
+Beide Formate werden beim Laden einmal in dieselbe Form gebracht: eine Spalte
+'Mitglied' mit dem Anzeigenamen, 'Vorname'/'Nachname', eine stabile
+'MitgliedID' aus dem normalisierten Namen, die Kennzahlen unter ihren
+Originalnamen und kompakte Datentypen (Kategorien für Namen, kleine Ganzzahlen
+für Zählwerte). Welche Spalten in welchem Diagramm landen, beschreibt das
+``FormatSchema`` des Formats, sodass die Tabs keine Formatunterscheidung mehr
+brauchen.
+
+``SCHEMAS`` ist zugleich die Registry der unterstützten Formate: Jedes Format
+bringt seinen Spalten-Fingerabdruck, die Pflichtspalten und die Abbildung der
+Namensspalten mit. ``match_format`` erkennt das Format allein aus der
+Kopfzeile; weitere Formate kommen über ``register_format`` hinzu.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bni_members import member_ids
+
+PAGISTO_NUMERIC_COLUMNS = ['Platzierung', 'Abwesenheit', 'Empfehlungen', 'Umsatzdanke',
+                           'Besucher', '121s', 'Testimonials', 'CTE', 'Punkte']
+PALMS_NUMERIC_COLUMNS = ['P', 'A', 'L', 'M', 'S', 'G (Eigenbedarf)', 'G (extern)',
+                         'R (Eigenbedarf)', 'R (extern)', 'V', '1-2-1', 'U', 'CTE', 'T']
+
+NAME_COLUMNS = ['Mitglied', 'Vorname', 'Nachname']
+
+
+@dataclass(frozen=True)
+class MetricGroup:
+    """Kennzahlen eines Diagramms (Spalte -> Legende) und die Spalten der zugehörigen Tabelle."""
+    columns: dict
+    table_columns: tuple = ()
+
+    @property
+    def table(self):
+        return list(self.table_columns or self.columns)
+
+
+def _names_from_member(df):
+    """Vor- und Nachname aus 'Mitglied'; getrennt wird am ersten Leerzeichen."""
+    if 'Mitglied' in df.columns:
+        # Einteilige Namen landen im Vornamen
+        parts = df['Mitglied'].str.partition(' ')
+        df['Vorname'] = parts[0]
+        df['Nachname'] = parts[2]
+    return df
+
+
+def _member_from_names(df):
+    """'Mitglied' aus Vor- und Nachname."""
+    for col in ['Vorname', 'Nachname']:
+        if col not in df.columns:
+            df[col] = ''
+    df['Mitglied'] = (
+        df['Vorname'].fillna('').astype(str) + ' ' + df['Nachname'].fillna('').astype(str)
+    ).str.strip()
+    return df
+
+
+@dataclass(frozen=True)
+class FormatSchema:
+    """Beschreibt, wie ein Dateiformat auf das einheitliche Schema abgebildet wird."""
+    name: str
+    numeric_columns: list
+    # Anzeigename -> Spalte, für Sortierung und Kennzahlauswahl
+    metrics: dict
+    # Spalten, die ein Mitglied in Tabellen identifizieren
+    name_columns: list
+    attendance: MetricGroup
+    referrals: MetricGroup
+    activity: MetricGroup
+    revenue: MetricGroup
+    education: MetricGroup
+    # Grundlage der Chapter-Kennzahlen; leere Angaben werden in der Übersicht ausgelassen
+    present_columns: tuple = ()
+    meeting_columns: tuple = ()
+    given_columns: tuple = ()
+    received_columns: tuple = ()
+    revenue_column: str = None
+    # Bestandteil der Ampelbewertung -> Spalten, deren Summe ihn bildet (siehe bni_scoring)
+    score_columns: dict = None
+    # Spalten der Kopfzeile, an denen das Format erkannt wird, und Spalten, ohne die es nicht geht
+    fingerprint: tuple = ()
+    required_columns: tuple = ()
+    # Ergänzt die einheitlichen Namensspalten 'Mitglied', 'Vorname' und 'Nachname'
+    map_names: object = None
+
+
+SCHEMAS = {
+    "pagisto": FormatSchema(
+        name="pagisto",
+        numeric_columns=PAGISTO_NUMERIC_COLUMNS,
+        metrics={
+            'Platzierung': 'Platzierung',
+            'Abwesenheit': 'Abwesenheit',
+            'Empfehlungen': 'Empfehlungen',
+            'Umsatz': 'Umsatzdanke',
+            'Besucher': 'Besucher',
+            '1-2-1 Meetings': '121s',
+            'Testimonials': 'Testimonials',
+            'CTE': 'CTE',
+            'Punkte': 'Punkte'
+        },
+        name_columns=['Mitglied'],
+        attendance=MetricGroup({'Abwesenheit': 'Abwesenheit'}),
+        referrals=MetricGroup({'Empfehlungen': 'Empfehlungen'}),
+        activity=MetricGroup({'Besucher': 'Besucher', '121s': '1-2-1 Meetings'}),
+        revenue=MetricGroup({'Umsatzdanke': 'Umsatz'}),
+        education=MetricGroup({'CTE': 'CTE', 'Testimonials': 'Testimonials'}),
+        given_columns=('Empfehlungen',),
+        revenue_column='Umsatzdanke',
+        score_columns={
+            'Abwesenheit': ('Abwesenheit',),
+            'Empfehlungen gegeben': ('Empfehlungen',),
+            'Besucher': ('Besucher',),
+            '1-2-1 Meetings': ('121s',),
+            'CTE': ('CTE',),
+            'Testimonials': ('Testimonials',),
+            'Umsatz': ('Umsatzdanke',),
+        },
+        fingerprint=('Datum', 'Mitglied', *PAGISTO_NUMERIC_COLUMNS),
+        required_columns=('Mitglied',),
+        map_names=_names_from_member,
+    ),
+    "palms": FormatSchema(
+        name="palms",
+        numeric_columns=PALMS_NUMERIC_COLUMNS,
+        metrics={
+            'Anwesenheit (P)': 'P',
+            'Abwesenheit (A)': 'A',
+            'Verspätung (L)': 'L',
+            'Medizinisch (M)': 'M',
+            'Vertretung (S)': 'S',
+            'Empfehlungen gegeben intern': 'G (Eigenbedarf)',
+            'Empfehlungen gegeben extern': 'G (extern)',
+            'Empfehlungen erhalten intern': 'R (Eigenbedarf)',
+            'Empfehlungen erhalten extern': 'R (extern)',
+            'Besucher (V)': 'V',
+            '1-2-1 Meetings': '1-2-1',
+            'Umsatz (U)': 'U',
+            'CTE': 'CTE',
+            'Testimonials (T)': 'T'
+        },
+        name_columns=['Vorname', 'Nachname'],
+        attendance=MetricGroup({'P': 'P', 'A': 'A', 'L': 'L', 'M': 'M', 'S': 'S'}),
+        referrals=MetricGroup(
+            {'G (Eigenbedarf)': 'Intern gegeben', 'G (extern)': 'Extern gegeben'},
+            table_columns=('G (Eigenbedarf)', 'G (extern)', 'R (Eigenbedarf)', 'R (extern)'),
+        ),
+        activity=MetricGroup({'V': 'Besucher', '1-2-1': '1-2-1 Meetings'}),
+        revenue=MetricGroup({'U': 'Umsatz'}),
+        education=MetricGroup({'CTE': 'CTE', 'T': 'Testimonials'}),
+        # Anwesend sind P und L; M und S zählen als entschuldigt, aber nicht anwesend
+        present_columns=('P', 'L'),
+        meeting_columns=('P', 'A', 'L', 'M', 'S'),
+        given_columns=('G (Eigenbedarf)', 'G (extern)'),
+        received_columns=('R (Eigenbedarf)', 'R (extern)'),
+        revenue_column='U',
+        score_columns={
+            'Abwesenheit': ('A',),
+            'Verspätung': ('L',),
+            'Empfehlungen gegeben': ('G (Eigenbedarf)', 'G (extern)'),
+            'Empfehlungen erhalten': ('R (Eigenbedarf)', 'R (extern)'),
+            'Besucher': ('V',),
+            '1-2-1 Meetings': ('1-2-1',),
+            'CTE': ('CTE',),
+            'Testimonials': ('T',),
+            'Umsatz': ('U',),
+        },
+        fingerprint=('Vorname', 'Nachname', *PALMS_NUMERIC_COLUMNS),
+        required_columns=('Vorname', 'Nachname'),
+        map_names=_member_from_names,
+    ),
+}
+
+NUMERIC_COLUMNS = {name: schema.numeric_columns for name, schema in SCHEMAS.items()}
+
+# Mindestanteil des Fingerabdrucks, der in der Kopfzeile vorkommen muss
+MIN_CONFIDENCE = 0.5
+
+
+def register_format(schema):
+    """Nimmt ein weiteres Format in die Registry auf; ein gleichnamiges wird ersetzt."""
+    if not schema.fingerprint or schema.map_names is None:
+        raise ValueError(f"Format {schema.name}: fingerprint und map_names sind erforderlich")
+    SCHEMAS[schema.name] = schema
+    NUMERIC_COLUMNS[schema.name] = schema.numeric_columns
+
+
+@dataclass(frozen=True)
+class FormatMatch:
+    """Ergebnis der Formaterkennung aus der Kopfzeile; ``file_format`` ist None, wenn nichts passt."""
+    file_format: str
+    confidence: float
+    # Format -> Anteil des Fingerabdrucks in der Kopfzeile
+    scores: dict
+    missing_required: tuple = ()
+    missing_columns: tuple = ()
+
+    def describe(self):
+        """Kurzbeschreibung für Begründungen und Fehlermeldungen."""
+        ranked = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)
+        return ", ".join(f"{name} {score * 100:.0f} %" for name, score in ranked)
+
+
+def match_format(columns):
+    """Ordnet eine Kopfzeile dem Format mit dem größten Anteil seines Fingerabdrucks zu.
+
+    Das Format gilt nur als erkannt, wenn mindestens ``MIN_CONFIDENCE`` des
+    Fingerabdrucks vorkommen und alle Pflichtspalten vorhanden sind.
+    """
+    columns = {str(col).strip() for col in columns}
+    scores = {
+        name: len(columns.intersection(schema.fingerprint)) / len(schema.fingerprint)
+        for name, schema in SCHEMAS.items()
+    }
+    best = max(scores, key=scores.get)
+    schema = SCHEMAS[best]
+    missing_required = tuple(col for col in schema.required_columns if col not in columns)
+    missing_columns = tuple(col for col in schema.fingerprint if col not in columns)
+    if scores[best] < MIN_CONFIDENCE or missing_required:
+        return FormatMatch(None, scores[best], scores, missing_required, missing_columns)
+    return FormatMatch(best, scores[best], scores, (), missing_columns)
+
+
+def _compact_numeric(series):
+    """Ganzzahlige Spalten ohne Lücken als kleinen Integer-Typ (mindestens int16), sonst unverändert."""
+    if series.dtype.kind not in 'iuf':
+        return series
+    values = series.to_numpy()
+    if series.dtype.kind == 'f' and (np.isnan(values).any() or not np.array_equal(values, np.floor(values))):
+        return series
+    compact = pd.to_numeric(series, downcast='integer')
+    # int8 ist für Summen über mehrere Wochen zu knapp
+    if compact.dtype.itemsize < 2:
+        compact = compact.astype(np.int16 if compact.dtype.kind == 'i' else np.uint16)
+    return compact
+
+
+def to_canonical(df, file_format):
+    """Bringt einen aufbereiteten Bericht in das einheitliche Schema mit kompakten Datentypen."""
+    schema = SCHEMAS[file_format]
+
+    # Einheitlicher Anzeigename und Vor-/Nachname für alle Formate
+    df = schema.map_names(df)
+
+    for col in NAME_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    # Stabile ID je Mitglied, unabhängig von Schreibweise und Format
+    df['MitgliedID'] = member_ids(df['Mitglied'])
+
+    for col in schema.numeric_columns:
+        if col in df.columns:
+            df[col] = _compact_numeric(df[col])
+
+    return df
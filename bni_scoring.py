@@ -0,0 +1,164 @@
+"""Ampelbewertung (Traffic Light) aller Mitglieder eines Berichts.
+
+Jeder Bestandteil (Abwesenheit, Empfehlungen, Besucher, 1-2-1 Meetings, CTE,
+Testimonials, Umsatz, ...) wird als Wert je Woche berechnet und über feste Stufen
+in einen Anteil seiner Punkte übersetzt. Wie viele Punkte ein Bestandteil
+höchstens bringt, legt das Gewichtungsprofil fest. Alle Mitglieder werden in
+einem Durchgang je Bestandteil bewertet (``np.searchsorted`` über die Stufen),
+ohne Schleife über Zeilen.
+
+Die Wochen eines Mitglieds ergeben sich bei PALMS aus P + A + L + M + S; ohne
+Treffen-Spalten (Pagisto) gilt der Standardzeitraum von 26 Wochen. Die Summe
+wird auf 100 Punkte bezogen auf die Bestandteile umgerechnet, die das Format
+liefert, damit Berichte beider Formate vergleichbar bleiben.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bni_schema import SCHEMAS
+from bni_sort import SortIndex
+
+DEFAULT_WEEKS = 26
+SCORE_COLUMN = 'Ampelpunkte'
+LIGHT_COLUMN = 'Ampel'
+
+# Ab diesen Punkten (von 100) gilt die nächste Farbe
+LIGHTS = ['Grau', 'Rot', 'Gelb', 'Grün']
+LIGHT_THRESHOLDS = (30, 50, 70)
+
+
+@dataclass(frozen=True)
+class ScoreRule:
+    """Stufen eines Bestandteils: ab ``thresholds[i]`` je Woche gilt der Anteil ``levels[i + 1]``.
+
+    Bei ``lower_is_better`` zählt jede überschrittene Schwelle eine Stufe nach
+    unten, z.B. bei Abwesenheiten.
+    """
+    thresholds: tuple
+    levels: tuple
+    lower_is_better: bool = False
+
+    def fractions(self, rates):
+        """Anteil der Punkte für ein Array von Werten je Woche."""
+        side = 'left' if self.lower_is_better else 'right'
+        return np.asarray(self.levels, dtype=float)[np.searchsorted(self.thresholds, rates, side=side)]
+
+
+# Stufen je Bestandteil, Werte je Woche (1 / 26 = einmal im Halbjahr)
+SCORE_RULES = {
+    'Abwesenheit': ScoreRule((0, 1 / 26, 2 / 26), (1, 2 / 3, 1 / 3, 0), lower_is_better=True),
+    'Verspätung': ScoreRule((0, 1 / 26), (1, 0.5, 0), lower_is_better=True),
+    'Empfehlungen gegeben': ScoreRule((0.5, 0.75, 1.0, 1.25), (0, 0.4, 0.6, 0.8, 1)),
+    'Empfehlungen erhalten': ScoreRule((0.5, 0.75, 1.0, 1.25), (0, 0.4, 0.6, 0.8, 1)),
+    'Besucher': ScoreRule((1 / 26, 2 / 26, 3 / 26, 5 / 26), (0, 0.25, 0.5, 0.75, 1)),
+    '1-2-1 Meetings': ScoreRule((0.25, 0.5, 0.75, 1.0), (0, 0.25, 0.5, 0.75, 1)),
+    'CTE': ScoreRule((0.25, 0.5, 1.0), (0, 1 / 3, 2 / 3, 1)),
+    'Testimonials': ScoreRule((1 / 26, 2 / 26), (0, 0.5, 1)),
+    'Umsatz': ScoreRule((100, 500, 1000, 2500), (0, 0.25, 0.5, 0.75, 1)),
+}
+
+# Gewichtungsprofile: Bestandteil -> höchstens erreichbare Punkte
+WEIGHT_PROFILES = {
+    'Standard': {
+        'Abwesenheit': 15, 'Verspätung': 5, 'Empfehlungen gegeben': 25, 'Besucher': 20,
+        '1-2-1 Meetings': 20, 'CTE': 10, 'Testimonials': 5,
+    },
+    'Empfehlungen & Umsatz': {
+        'Abwesenheit': 15, 'Verspätung': 5, 'Empfehlungen gegeben': 25, 'Empfehlungen erhalten': 10,
+        'Besucher': 10, '1-2-1 Meetings': 15, 'CTE': 5, 'Umsatz': 15,
+    },
+    'Wachstum': {
+        'Abwesenheit': 15, 'Verspätung': 5, 'Empfehlungen gegeben': 20, 'Besucher': 30,
+        '1-2-1 Meetings': 15, 'CTE': 10, 'Testimonials': 5,
+    },
+}
+
+
+def load_profiles(path=None):
+    """Standardprofile plus eigene Profile aus einer JSON-Datei (``BNI_SCORE_PROFILES``).
+
+    Die Datei enthält ``{"Profilname": {"Bestandteil": Punkte, ...}, ...}``.
+    """
+    path = path or os.environ.get("BNI_SCORE_PROFILES")
+    profiles = dict(WEIGHT_PROFILES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            custom = json.load(f)
+        for name, weights in custom.items():
+            profiles[name] = validate_weights(weights)
+    return profiles
+
+
+def validate_weights(weights):
+    """Prüft die Bestandteile eines Profils und liefert es mit float-Gewichten."""
+    unknown = sorted(set(weights) - set(SCORE_RULES))
+    if unknown:
+        raise ValueError(f"Unbekannte Bestandteile der Ampelbewertung: {', '.join(unknown)}")
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Gewichte der Ampelbewertung dürfen nicht negativ sein")
+    return {component: float(weight) for component, weight in weights.items()}
+
+
+def _member_weeks(df, schema, weeks):
+    """Wochen je Mitglied aus den Treffen-Spalten, sonst bzw. bei 0 Treffen ``weeks``."""
+    columns = [col for col in schema.meeting_columns if col in df.columns]
+    if not columns:
+        return np.full(len(df), float(weeks))
+    meetings = np.nansum(df[columns].to_numpy(dtype=float, na_value=np.nan), axis=1)
+    return np.where(meetings > 0, meetings, float(weeks))
+
+
+def score_table(df, file_format, weights=None, weeks=DEFAULT_WEEKS):
+    """Punkte je Bestandteil, Ampelpunkte (0-100) und Ampelfarbe für jede Zeile von ``df``."""
+    schema = SCHEMAS[file_format]
+    weights = validate_weights(WEIGHT_PROFILES['Standard'] if weights is None else weights)
+    member_weeks = _member_weeks(df, schema, weeks)
+
+    table = pd.DataFrame({'Mitglied': df['Mitglied'].array, 'Wochen': member_weeks})
+    total = np.zeros(len(df))
+    max_points = 0.0
+    for component, weight in weights.items():
+        columns = [col for col in (schema.score_columns or {}).get(component, ()) if col in df.columns]
+        if not columns or weight == 0:
+            continue
+        # Fehlende Werte zählen als 0, wie in den Chapter-Kennzahlen
+        counts = np.nansum(df[columns].to_numpy(dtype=float, na_value=np.nan), axis=1)
+        points = SCORE_RULES[component].fractions(counts / member_weeks) * weight
+        table[component] = points
+        total += points
+        max_points += weight
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table[SCORE_COLUMN] = total / max_points * 100 if max_points else np.nan
+    scores = table[SCORE_COLUMN].to_numpy()
+    # Code -1 ergibt eine fehlende Farbe, wenn es keine Punkte gibt
+    codes = np.where(np.isnan(scores), -1, np.searchsorted(LIGHT_THRESHOLDS, scores, side='right'))
+    table[LIGHT_COLUMN] = pd.Categorical.from_codes(codes, categories=LIGHTS, ordered=True)
+    table.index = df.index
+    return table
+
+
+class MemberScores:
+    """Ampelbewertung eines Berichts mit vorberechneter Rangfolge nach Ampelpunkten."""
+
+    def __init__(self, df, file_format, weights=None, weeks=DEFAULT_WEEKS):
+        self.table = score_table(df, file_format, weights, weeks)
+        self._order = SortIndex(self.table, [SCORE_COLUMN])
+
+    def top(self, n, ascending=False):
+        """Positionen der ``n`` Mitglieder mit den meisten (bzw. wenigsten) Ampelpunkten."""
+        return self._order.top(SCORE_COLUMN, n, ascending)
+
+    def ranking(self):
+        """Alle Mitglieder nach Ampelpunkten absteigend mit Rang (gleiche Punkte, gleicher Rang)."""
+        ranked = self.table.iloc[self._order.positions(SCORE_COLUMN)]
+        rank = ranked[SCORE_COLUMN].rank(ascending=False, method='min')
+        return ranked.assign(Rang=rank.astype('Int64')).set_index('Rang')
+
+    def light_counts(self):
+        """Anzahl Mitglieder je Ampelfarbe, von Grün bis Grau."""
+        return self.table[LIGHT_COLUMN].value_counts(sort=False).reindex(LIGHTS[::-1], fill_value=0)
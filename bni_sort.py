@@ -0,0 +1,43 @@
+"""Vorberechnete Sortierreihenfolgen für die Sortierung und Top-N-Auswahl.
+
+Beim Laden wird für jede Kennzahl einmal die aufsteigende Reihenfolge der
+Zeilen berechnet. Ein Wechsel des Sortierkriteriums, der Richtung oder der
+Anzahl angezeigter Mitglieder schneidet danach nur noch die ersten ``n``
+Positionen aus dieser Reihenfolge, statt den ganzen DataFrame neu zu sortieren.
+"""
+import numpy as np
+
+
+class SortIndex:
+    """Sortierreihenfolgen aller Kennzahlen eines Berichts; fehlende Werte stehen immer am Ende."""
+
+    def __init__(self, df, columns):
+        self._orders = {}
+        for col in columns:
+            if col not in df.columns or col in self._orders:
+                continue
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            # NaN landet bei argsort hinter allen Zahlen
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            self._orders[col] = (order, int(np.count_nonzero(~np.isnan(values))))
+
+    def __contains__(self, column):
+        return column in self._orders
+
+    def top(self, column, n, ascending=False):
+        """Positionen der ersten ``n`` Zeilen nach ``column`` in der gewünschten Richtung."""
+        order, valid = self._orders[column]
+        if ascending:
+            return order[:n]
+        # Absteigend: Zahlen rückwärts, fehlende Werte wie bei sort_values danach
+        head = order[:valid][::-1][:n]
+        if len(head) < n:
+            head = np.concatenate([head, order[valid:valid + n - len(head)]])
+        return head
+
+    def positions(self, column, ascending=False):
+        """Alle Positionen nach ``column`` sortiert, z.B. zum Filtern und Blättern."""
+        order, valid = self._orders[column]
+        if ascending:
+            return order
+        return np.concatenate([order[:valid][::-1], order[valid:]])